@@ -1,31 +1,162 @@
-import os, tempfile, subprocess, json, re, math
-from fastapi import FastAPI, Body
+import os, tempfile, json, asyncio, threading, time
+from fastapi import FastAPI, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import requests
+from fastapi.responses import StreamingResponse, Response, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+import httpx
 from dotenv import load_dotenv
 from datetime import datetime
+from contextlib import asynccontextmanager, aclosing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+
+from .rawfile import read_rawfile, magnitude, to_db, phase
+from .encoding import BINARY_MEDIA_TYPE, DTYPES as BINARY_DTYPES, wants_binary, to_binary, to_json, iter_binary, iter_json
+from .cache import SimulationCache, SpillCache
+from .chatcache import ChatCache
+from .scheduler import SimulationScheduler, QueueFullError
+from .sharedspice import SharedSpicePool
+from .sweep import expand_points, apply_parameters, stack_results
+from .sse import SSEDecoder, format_event
+from .blocks import SpiceBlockExtractor, extract_spice_blocks
+from .netlist import rewrite_netlist, rewrite_statements, render, analysis_span
+from .library import CircuitIndex
+from .store import CircuitStore, content_digest
+from .downsample import METHODS as DOWNSAMPLE_METHODS, downsample_result, slice_result
+from .jobs import JobStore, job_summary, parse_progress, read_tail
+from .metrics import (CONTENT_TYPE as METRICS_CONTENT_TYPE, CHAT_DELTAS, CHAT_FIRST_TOKEN_SECONDS,
+                      CHAT_TOKENS_PER_SECOND, CHAT_UPSTREAM_SECONDS, MetricsMiddleware,
+                      current_profile, record_stage, render_gauges, render_metrics, stage)
 
 load_dotenv()
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# OPENROUTER_URL permite apuntar a un servidor local que imite a OpenRouter (pruebas)
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
+
+# Caché de respuestas de /chat (desactivada por defecto): CHAT_CACHE_TTL en segundos
+chat_cache = ChatCache(
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "0")),
+    max_bytes=int(os.getenv("CHAT_CACHE_MAX_MB", "32")) * 1024 * 1024,
+)
+
+# Cliente HTTP compartido: conexiones keep-alive reutilizadas entre peticiones a /chat
+CHAT_MAX_CONNECTIONS = int(os.getenv("CHAT_MAX_CONNECTIONS", "64"))
+http_client = None
 
 # Directorio para circuitos generados
 CIRCUITS_DIR = os.path.join(os.path.dirname(__file__), "circuits_generated")
 os.makedirs(CIRCUITS_DIR, exist_ok=True)
 
-app = FastAPI()
+# Almacén por contenido (objects/ab/<sha256>.cir) y su índice SQLite de alias para /files
+circuit_store = CircuitStore(os.getenv("CIRCUITS_STORE_DIR", os.path.join(CIRCUITS_DIR, "objects")))
+circuit_index = CircuitIndex(
+    CIRCUITS_DIR,
+    os.getenv("FILES_INDEX_PATH", os.path.join(os.path.dirname(__file__), "circuits_index.sqlite3")),
+    store=circuit_store,
+)
+# Comprimir los objetos sin escribir en N días (0 = nunca)
+FILES_COMPRESS_AFTER_DAYS = float(os.getenv("FILES_COMPRESS_AFTER_DAYS", "0"))
+FILES_PAGE_SIZE = int(os.getenv("FILES_PAGE_SIZE", "100"))
+
+# Nombre del rawfile en los netlists reescritos (se reemplaza por la ruta real al ejecutar)
+RAWFILE = "output.raw"
+
+# Caché de resultados de simulación (SIM_CACHE_DIR activa el nivel en disco)
+simulation_cache = SimulationCache(
+    max_bytes=int(os.getenv("SIM_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    disk_dir=os.getenv("SIM_CACHE_DIR") or None,
+)
+
+# Rawfiles de más de SIM_SPILL_MB se decodifican por tramos a archivos (en SIM_SPILL_DIR)
+# y la respuesta se envía por partes, sin cargar el resultado en RAM (0 = nunca). Esos
+# resultados quedan en disco (hasta SIM_SPILL_CACHE_MB) para /simulate/results
+SIM_SPILL_MB = float(os.getenv("SIM_SPILL_MB", "64"))
+spill_cache = SpillCache(
+    max_bytes=int(os.getenv("SIM_SPILL_CACHE_MB", "1024")) * 1024 * 1024,
+    root=os.getenv("SIM_SPILL_DIR") or None,
+)
+
+# Planificador de ngspice: SIM_WORKERS (por defecto, núcleos), cola, timeout (s) y memoria (MB)
+simulation_scheduler = SimulationScheduler(
+    workers=int(os.getenv("SIM_WORKERS", "0")) or None,
+    queue_size=int(os.getenv("SIM_QUEUE_SIZE")) if os.getenv("SIM_QUEUE_SIZE") else None,
+    timeout=float(os.getenv("SIM_TIMEOUT", "60")),
+    memory_mb=int(os.getenv("SIM_MEMORY_MB", "2048")),
+)
+
+# Máximo de puntos por barrido o Monte Carlo, y de netlists por lote
+SWEEP_MAX_POINTS = int(os.getenv("SWEEP_MAX_POINTS", "1000"))
+BATCH_MAX_NETLISTS = int(os.getenv("BATCH_MAX_NETLISTS", "10000"))
+
+# Motor de simulación: SIM_ENGINE=shared mantiene instancias de libngspice cargadas
+# (NGSPICE_LIBRARY indica la ruta); por defecto, un proceso ngspice por simulación
+SIM_ENGINE = os.getenv("SIM_ENGINE", "subprocess").lower()
+shared_engine = None
+shared_engine_failed = False
+shared_engine_lock = threading.Lock()
+
+# Trabajos asíncronos: los resultados se conservan JOB_TTL segundos tras terminar
+simulation_jobs = JobStore(ttl=float(os.getenv("JOB_TTL", "600")))
+job_executor = ThreadPoolExecutor(
+    max_workers=simulation_scheduler.workers + simulation_scheduler.queue_size)
+# Un lugar por trabajo desde que se crea hasta que termina: los que esperan en la cola
+# interna del executor todavía no cuentan en el planificador
+job_slots = threading.BoundedSemaphore(simulation_scheduler.workers + simulation_scheduler.queue_size)
+
+def get_http_client():
+    """Cliente asíncrono compartido (se crea al primer uso) con límite de conexiones"""
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=CHAT_MAX_CONNECTIONS,
+                                max_keepalive_connections=CHAT_MAX_CONNECTIONS,
+                                keepalive_expiry=60),
+            # Sin conexión libre en 10 s -> PoolTimeout en lugar de encolar sin límite
+            timeout=httpx.Timeout(120, connect=10, pool=10),
+        )
+    return http_client
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if FILES_COMPRESS_AFTER_DAYS > 0:
+        threading.Thread(target=compress_cold_circuits, daemon=True).start()
+    yield
+    spill_cache.close()
+    global http_client
+    if http_client is not None:
+        # Otro ciclo de vida de la app (p. ej. otro TestClient) crea un cliente nuevo
+        client, http_client = http_client, None
+        await client.aclose()
+
+
+def compress_cold_circuits():
+    """Comprime periódicamente (cada hora) los circuitos fríos del almacén"""
+    while True:
+        try:
+            circuit_store.compress_cold(FILES_COMPRESS_AFTER_DAYS * 86400)
+        except OSError as e:
+            print(f"Error compressing circuits: {e}")
+        time.sleep(3600)
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # ajusta en producción
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache"],
 )
+# Métricas por ruta (GET /metrics) y perfilado por etapas con "X-Profile: 1"
+app.add_middleware(MetricsMiddleware)
 
 @app.post("/chat")
-def chat(payload: dict = Body(...)):
+async def chat(payload: dict = Body(...)):
     """
-    payload = { "system": "...", "user": "...", "question": "...", "model": "deepseek/deepseek-chat-v3.1:free", "stream": false }
+    payload = { "system": "...", "user": "...", "question": "...", "model": "deepseek/deepseek-chat-v3.1:free", "stream": false, "passthrough": false, "simulate": false, "cache": true }
+    Con CHAT_CACHE_TTL > 0 las respuestas se guardan en caché por (modelo, mensajes);
+    "cache": false la ignora para esta petición. El header X-Cache indica hit o miss.
     """
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -52,437 +183,894 @@ def chat(payload: dict = Body(...)):
         "messages": messages,
         "stream": is_stream,
     }
+    client = get_http_client()
+    started = time.perf_counter()
+
+    cache_key = None
+    cached = None
+    if chat_cache.enabled and payload.get("cache", True):
+        cache_key = chat_cache.key(data["model"], messages, is_stream)
+        cached = chat_cache.get(cache_key)
+    cache_headers = {"X-Cache": "hit" if cached else "miss"} if cache_key else None
 
     if is_stream:
-        full_content = ""  # Acumular todo el contenido para procesarlo al final
-        
-        def generate():
-            nonlocal full_content
-            with requests.post(OPENROUTER_URL, headers=headers, json=data, stream=True, timeout=120) as r:
+        # passthrough: reenviar cada evento de OpenRouter tal cual, sin re-codificarlo
+        passthrough = payload.get("passthrough", False)
+        # simulate: lanzar un trabajo de simulación por cada netlist en cuanto se cierra su bloque
+        auto_simulate = payload.get("simulate", False)
+        extractor = SpiceBlockExtractor()
+        # Respuesta que se va a guardar en caché: eventos de OpenRouter y archivos por hash del bloque
+        recorded = {"events": [], "files": {}} if cache_key and cached is None else None
+        replay_files = cached["files"] if cached else {}
+
+        async def blocks_event(blocks):
+            # Guardar los bloques recién cerrados y avisar al cliente sin esperar al final
+            saved_files = []
+            simulations = []
+            for code in blocks:
+                digest = content_digest(code.strip())
+                # Al repetir una respuesta en caché se reutilizan los archivos ya guardados
+                filename = replay_files.get(digest)
+                if filename is None:
+                    filename = await run_in_threadpool(save_spice_block, code)
+                if filename is None:
+                    continue
+                if recorded is not None:
+                    recorded["files"][digest] = filename
+                saved_files.append(filename)
+                if auto_simulate:
+                    job = start_simulation_job(code.strip())
+                    if job is not None:
+                        simulations.append({"file": filename, **job_summary(job)})
+            if not saved_files:
+                return None
+            # Enviar información sobre archivos generados
+            file_info = {"generated_files": saved_files}
+            if auto_simulate:
+                file_info["simulations"] = simulations
+            return format_event(json.dumps(file_info, ensure_ascii=False))
+
+        async def upstream_events():
+            if cached:
+                for event_data in cached["events"]:
+                    yield {"event": None, "data": event_data, "id": None}
+                return
+
+            # Se lee de OpenRouter solo cuando el cliente consume lo anterior (backpressure)
+            async with client.stream("POST", OPENROUTER_URL, headers=headers, json=data) as r:
+                latency = time.perf_counter() - started
+                CHAT_UPSTREAM_SECONDS.observe(latency, stream="true")
+                record_stage("upstream", latency)
                 r.raise_for_status()
-                r.encoding = 'utf-8'  # Forzar UTF-8
-                buffer = ""
-                for chunk in r.iter_content(chunk_size=1024, decode_unicode=True):
-                    if chunk:
-                        buffer += chunk
-                        while True:
-                            line_end = buffer.find('\n')
-                            if line_end == -1:
-                                break
-                            
-                            line = buffer[:line_end].strip()
-                            buffer = buffer[line_end + 1:]
-                            
-                            if line.startswith('data: '):
-                                data_content = line[6:]
-                                if data_content == '[DONE]':
-                                    # Procesar el contenido completo al final
-                                    saved_files = save_spice_blocks_from_content(full_content)
-                                    # Enviar información sobre archivos generados
-                                    if saved_files:
-                                        file_info = {"generated_files": saved_files}
-                                        yield f"data: {json.dumps(file_info, ensure_ascii=False)}\n\n".encode('utf-8')
-                                    return
-                                
-                                try:
-                                    data_obj = json.loads(data_content)
-                                    content = data_obj["choices"][0]["delta"].get("content")
-                                    if content:
-                                        full_content += content  # Acumular contenido
-                                        # Asegurar que el contenido esté en UTF-8
-                                        yield f"data: {json.dumps({'content': content}, ensure_ascii=False)}\n\n".encode('utf-8')
-                                except json.JSONDecodeError:
-                                    pass
-        
-        return StreamingResponse(generate(), media_type="text/plain; charset=utf-8")
+                decoder = SSEDecoder()
+                async for chunk in r.aiter_bytes():
+                    for event in decoder.feed(chunk):
+                        yield event
+                for event in decoder.flush():
+                    yield event
+
+        async def generate():
+            first_token = None
+            deltas = 0
+            done = False
+            # aclosing: al cortar en [DONE] se cierra también la conexión con OpenRouter
+            async with aclosing(upstream_events()) as events:
+                async for event in events:
+                    if event["data"] == '[DONE]':
+                        done = True
+                        break
+
+                    try:
+                        content = json.loads(event["data"])["choices"][0]["delta"].get("content")
+                    except (json.JSONDecodeError, KeyError, IndexError, TypeError, AttributeError):
+                        continue
+                    if recorded is not None:
+                        recorded["events"].append(event["data"])
+                    if passthrough:
+                        yield format_event(event["data"])
+                    if content:
+                        deltas += 1
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                            CHAT_FIRST_TOKEN_SECONDS.observe(first_token - started)
+                        if not passthrough:
+                            yield format_event('{"content": ' + json.dumps(content, ensure_ascii=False) + '}')
+                        blocks = extractor.feed(content)
+                        if blocks:
+                            file_event = await blocks_event(blocks)
+                            if file_event:
+                                yield file_event
+
+            # Un cierre de bloque sin salto de línea final
+            file_event = await blocks_event(extractor.flush())
+            if file_event:
+                yield file_event
+            # Solo respuestas completas (terminadas en [DONE]): un stream cortado o con un
+            # evento de error no se guarda; si el cliente corta antes, el generador no llega aquí
+            if recorded is not None and done and deltas:
+                chat_cache.put(cache_key, recorded)
+
+            if deltas:
+                CHAT_DELTAS.inc(deltas)
+                elapsed = time.perf_counter() - first_token
+                if elapsed > 0:
+                    CHAT_TOKENS_PER_SECOND.observe(deltas / elapsed)
+            profile = current_profile()
+            if profile is not None:
+                # Los headers ya se enviaron: el desglose completo va como último evento
+                profile["total"] = {"ms": round((time.perf_counter() - started) * 1000, 3), "count": 1}
+                yield format_event(json.dumps({"profile": profile}))
+            if passthrough:
+                # Como en OpenRouter, [DONE] cierra el stream (después de generated_files)
+                yield format_event('[DONE]')
+
+        return StreamingResponse(generate(), media_type="text/plain; charset=utf-8",
+                                 headers=cache_headers)
+    elif cached:
+        result = {**cached["response"]}
+        if cached["files"]:
+            result["generated_files"] = cached["files"]
+        return JSONResponse(result, headers=cache_headers)
     else:
-        r = requests.post(OPENROUTER_URL, headers=headers, json=data, timeout=120)
+        with stage("upstream"):
+            r = await client.post(OPENROUTER_URL, headers=headers, json=data)
+        CHAT_UPSTREAM_SECONDS.observe(time.perf_counter() - started, stream="false")
         r.raise_for_status()
         response_data = r.json()
         content = response_data["choices"][0]["message"]["content"]
         
         # Extraer y guardar automáticamente bloques SPICE
-        saved_files = save_spice_blocks_from_content(content)
+        saved_files = await run_in_threadpool(save_spice_blocks_from_content, content)
         
+        if cache_key:
+            chat_cache.put(cache_key, {"response": response_data, "files": saved_files})
+
         # Incluir información de archivos generados en la respuesta
-        result = response_data
+        result = {**response_data}
         if saved_files:
             result["generated_files"] = saved_files
         
-        return result
+        return JSONResponse(result, headers=cache_headers)
 
 
 def save_spice_blocks_from_content(content):
     """Extrae bloques SPICE de la respuesta y los guarda automáticamente"""
     saved_files = []
+    with stage("extract_blocks"):
+        blocks = extract_spice_blocks(content)
+    for spice_code in blocks:
+        filename = save_spice_block(spice_code)
+        if filename and filename not in saved_files:
+            saved_files.append(filename)
+    return saved_files
+
+
+def save_spice_block(spice_code):
+    """Guarda un bloque SPICE si es un netlist válido; devuelve el nombre del archivo o None"""
+    if '.end' not in spice_code:  # Verificar que sea un netlist válido
+        return None
     try:
-        # Buscar bloques de código SPICE
-        spice_pattern = r'```(?:spice)?\n([\s\S]*?)\n```'
-        matches = re.findall(spice_pattern, content, re.IGNORECASE)
-        
-        for i, spice_code in enumerate(matches):
-            if '.end' in spice_code:  # Verificar que sea un netlist válido
-                timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                filename = f"generated_{timestamp}_{i+1}.cir"
-                filepath = os.path.join(CIRCUITS_DIR, filename)
-                
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(spice_code.strip())
-                
-                saved_files.append(filename)
-                
+        spice_code = spice_code.strip()
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        # El hash del contenido evita que dos streams simultáneos usen el mismo nombre
+        filename = f"generated_{timestamp}_{content_digest(spice_code)[:12]}.cir"
+        with stage("save_block"):
+            circuit_index.save(filename, spice_code)
+        return filename
     except Exception as e:
         print(f"Error saving SPICE blocks: {e}")
-    
-    return saved_files
+        return None
 
 
 @app.post("/simulate")
-def simulate_spice(body: dict = Body(...)):
+async def simulate_spice(request: Request, body: dict = Body(...)):
     """
-    body = { "netlist": "...", "analysis":"ac|tran" }
-    Devuelve logs crudos y datos extraídos del archivo rawfile de ngspice.
+    body = { "netlist": "...", "analysis":"ac|tran", "vectors": ["v(out)", ...],
+             "max_points": 2000, "downsample": "minmax"|"lttb" }
+    Devuelve logs crudos y todos los plots/vectores del archivo rawfile de ngspice.
+    En análisis AC, "y" es la magnitud en dB y "phase" la fase en grados del mismo vector.
+    "vectors" (opcional) limita la decodificación y la respuesta a esos vectores.
+    "max_points" (opcional) reduce cada traza en el servidor; el resultado completo
+    queda en caché y /simulate/results/{result_id} devuelve un rango a resolución completa.
+    Con "Accept: application/x-ngspice-vectors" la respuesta usa el formato binario
+    de encoding.py; "dtype": "float32" reduce los buffers a la mitad.
+    Los resultados más grandes que SIM_SPILL_MB se decodifican a disco y, sin
+    "max_points", se envían por partes ("spilled": true).
     """
     net = body["netlist"]
+    vectors = requested_vectors(body)
+    try:
+        max_points, method = requested_downsampling(body)
+        dtype = requested_dtype(body.get("dtype"))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # Si el cliente se desconecta, cancelar la simulación y liberar el worker
+    cancel = threading.Event()
+    watcher = asyncio.create_task(cancel_on_disconnect(request, cancel))
+    try:
+        result = await run_in_threadpool(simulate_netlist, net, vectors, cancel, spill=True)
+    except QueueFullError as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+    finally:
+        watcher.cancel()
+
+    if max_points:
+        result = await run_in_threadpool(timed_downsample, result, max_points, method)
+    elif result.get("spilled"):
+        return stream_result(request, result, dtype)
+    return await encode_result(request, result, dtype)
+
+
+def timed_downsample(result, max_points, method):
+    with stage("downsample"):
+        result = downsample_result(result, max_points, method)
+    # El resultado reducido ya está en memoria
+    result.pop("spilled", None)
+    return result
+
+
+async def encode_result(request, result, dtype="float64"):
+    """Respuesta JSON o, si el cliente lo pide en el header Accept, el formato binario compacto"""
+    if wants_binary(request.headers.get("accept")):
+        with stage("encode"):
+            content = await run_in_threadpool(to_binary, result, dtype)
+        return Response(content, media_type=BINARY_MEDIA_TYPE)
+    with stage("encode"):
+        return to_json(result)
+
+
+def stream_result(request, result, dtype):
+    """Como encode_result, pero por partes, para resultados decodificados a disco"""
+    if wants_binary(request.headers.get("accept")):
+        return StreamingResponse(iter_binary(result, dtype), media_type=BINARY_MEDIA_TYPE)
+    return StreamingResponse(iter_json(result), media_type="application/json")
+
+
+@app.get("/simulate/results/{result_id}")
+async def zoom_simulation_result(request: Request, result_id: str, x_min: float = None,
+                                 x_max: float = None, max_points: int = None,
+                                 downsample: str = "minmax", dtype: str = "float64"):
+    """
+    Rango [x_min, x_max] de un resultado en caché (result_id de /simulate) a
+    resolución completa, sin volver a ejecutar ngspice. "max_points" reduce
+    también el rango si sigue siendo demasiado grande para graficar.
+    """
+    try:
+        max_points, method = requested_downsampling({"max_points": max_points, "downsample": downsample})
+        dtype = requested_dtype(dtype)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    cached = await run_in_threadpool(cached_result, result_id)
+    if cached is None:
+        return JSONResponse({"error": "Result not found; run the simulation again"}, status_code=404)
+
+    result = await run_in_threadpool(slice_result, {**cached, "result_id": result_id}, x_min, x_max)
+    # El rango se copia a memoria aunque el resultado esté en disco
+    result.pop("spilled", None)
+    if max_points:
+        result = await run_in_threadpool(timed_downsample, result, max_points, method)
+    return await encode_result(request, result, dtype)
+
+
+def requested_vectors(body):
+    """Lista de vectores pedidos en el body (None = todos)"""
+    vectors = body.get("vectors") or None
+    if isinstance(vectors, str):
+        vectors = [vectors]
+    return vectors
+
+
+def requested_dtype(dtype):
+    """dtype de los buffers del formato binario ("float64" si no se indica)"""
+    dtype = dtype or "float64"
+    if dtype not in BINARY_DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+    return dtype
+
+
+def requested_downsampling(body):
+    """(max_points, método) pedidos en el body; max_points None = sin reducir"""
+    max_points = body.get("max_points")
+    method = body.get("downsample") or "minmax"
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if max_points is None:
+        return None, method
+    max_points = int(max_points)
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    return max_points, method
+
+
+async def cancel_on_disconnect(request, cancel):
+    """Activa `cancel` cuando el cliente cierra la conexión"""
+    while not await request.is_disconnected():
+        await asyncio.sleep(0.5)
+    cancel.set()
+
+
+@app.post("/simulate/jobs")
+def create_simulation_job(body: dict = Body(...)):
+    """
+    body = { "netlist": "...", "vectors": [...] }
+    Encola la simulación y devuelve el id del trabajo sin esperar a ngspice.
+    """
+    job = start_simulation_job(body["netlist"], requested_vectors(body))
+    if job is None:
+        return JSONResponse({"error": "Simulation queue is full; try again later"},
+                            status_code=503, headers={"Retry-After": "1"})
+    return job_summary(job)
+
+
+@app.get("/simulate/jobs/{job_id}")
+def get_simulation_job(job_id: str, request: Request, dtype: str = "float64"):
+    """Estado del trabajo; incluye "result" (mismo formato que /simulate) cuando terminó"""
+    try:
+        dtype = requested_dtype(dtype)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    job = simulation_jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    summary = job_summary(job)
+    if job["status"] != "done":
+        return summary
+
+    if wants_binary(request.headers.get("accept")):
+        content = to_binary({**summary, "result": job["result"]}, dtype)
+        return Response(content, media_type=BINARY_MEDIA_TYPE)
+    return {**summary, "result": to_json(job["result"])}
+
+
+@app.delete("/simulate/jobs/{job_id}")
+def cancel_simulation_job(job_id: str):
+    """Cancela un trabajo en cola o en ejecución"""
+    job = simulation_jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    job["cancel"].set()
+    return job_summary(job)
+
+
+@app.get("/simulate/jobs/{job_id}/events")
+async def simulation_job_events(job_id: str):
+    """Stream SSE con el progreso del trabajo ("progress") y su estado final ("end")"""
+    if simulation_jobs.get(job_id) is None:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+
+    async def events():
+        last = None
+        while True:
+            job = simulation_jobs.get(job_id)
+            if job is None:
+                yield f"event: end\ndata: {json.dumps({'id': job_id, 'status': 'expired'})}\n\n"
+                return
+
+            summary = job_summary(job)
+            final = job["status"] in ("done", "error", "cancelled")
+            if summary != last:
+                event = "end" if final else "progress"
+                yield f"event: {event}\ndata: {json.dumps(summary, ensure_ascii=False)}\n\n"
+                last = summary
+            if final:
+                return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def start_simulation_job(net, vectors=None):
+    """Crea un trabajo de simulación y lo lanza en segundo plano; None si la cola está llena"""
+    if simulation_scheduler.is_full() or not job_slots.acquire(blocking=False):
+        return None
+    job = simulation_jobs.create()
+    job_executor.submit(run_simulation_job, job["id"], net, vectors)
+    return job
+
+
+def run_simulation_job(job_id, net, vectors):
+    """Ejecuta un trabajo en segundo plano, guarda su resultado y libera su lugar"""
+    try:
+        job = simulation_jobs.get(job_id)
+        if job is None:
+            return
+        simulation_jobs.update(job_id, status="running", progress=0.0)
+
+        def progress(fraction):
+            simulation_jobs.update(job_id, progress=round(fraction, 4))
+
+        try:
+            result = simulate_netlist(net, vectors, job["cancel"], progress)
+        except Exception as e:
+            print(f"Error running simulation job {job_id}: {e}")
+            simulation_jobs.update(job_id, status="error", error=str(e))
+            return
+
+        if job["cancel"].is_set():
+            simulation_jobs.update(job_id, status="cancelled")
+        else:
+            simulation_jobs.update(job_id, status="done", progress=1.0, result=result)
+    finally:
+        job_slots.release()
+
+
+@app.post("/simulate/sweep")
+def simulate_sweep(request: Request, body: dict = Body(...)):
+    """
+    body = { "netlist": "...", "mode": "grid"|"montecarlo", "vectors": [...],
+             "parameters": {"R1": {"start": "1k", "stop": "100k", "points": 10, "scale": "log"},
+                            "C1": {"tolerance": 0.1, "distribution": "gaussian"}},
+             "samples": 100, "seed": 1, "stream": false }
+    Simula todos los puntos en paralelo y devuelve un array apilado por vector con
+    estadísticas. Con "stream": true responde NDJSON: una línea por punto a medida
+    que termina y una línea final con el resumen.
+    """
+    vectors = requested_vectors(body)
+    # El netlist base se reescribe una sola vez; cada punto solo sustituye valores
+    base = rewrite_netlist(body["netlist"], RAWFILE)
+    try:
+        points = expand_points(base, body.get("parameters") or {}, body.get("mode", "grid"),
+                               body.get("samples", 100), body.get("seed"), SWEEP_MAX_POINTS)
+        netlists = [apply_parameters(base, point) for point in points]
+        dtype = requested_dtype(body.get("dtype"))
+    except (ValueError, TypeError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    events = run_sweep(points, netlists, vectors)
+    if body.get("stream"):
+        lines = (json.dumps(to_json(event), ensure_ascii=False) + "\n" for event in events)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    summary = None
+    for event in events:
+        if event["type"] == "summary":
+            summary = event
+    if wants_binary(request.headers.get("accept")):
+        return Response(to_binary(summary, dtype), media_type=BINARY_MEDIA_TYPE)
+    return to_json(summary)
+
+
+def run_sweep(points, netlists, vectors=None):
+    """Simula los puntos en paralelo; genera un evento por punto terminado y el resumen final"""
+    results = [None] * len(points)
+    for i, result in run_parallel(netlists, vectors):
+        event = {"type": "point", "index": i, "parameters": points[i]}
+        if isinstance(result, Exception):
+            yield {**event, "ok": False, "error": str(result)}
+            continue
+
+        results[i] = result
+        event.update(ok=result["ok"], x=result["x"], y=result["y"])
+        if not result["ok"]:
+            event["logs"] = result["logs"]
+        yield event
+
+    yield {"type": "summary", "parameters": points, **stack_results(results)}
+
+
+def run_parallel(netlists, vectors=None, rewrite=False):
+    """
+    Simula los netlists en paralelo (tantos a la vez como workers del planificador)
+    y genera (índice, resultado o excepción) a medida que terminan. Con `rewrite`
+    los netlists se reescriben para modo batch dentro de cada worker.
+    """
+    cancel = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=simulation_scheduler.workers)
+    try:
+        futures = {executor.submit(simulate_point, net, vectors, cancel, rewrite): i
+                   for i, net in enumerate(netlists)}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+    finally:
+        # Cliente desconectado o fin del lote: detener lo que quede pendiente
+        cancel.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def simulate_point(net, vectors, cancel, rewrite=False):
+    """Simula un punto de un barrido o lote; si la cola está llena espera en lugar de fallar"""
+    statements = None
+    if rewrite:
+        statements = rewrite_statements(net, RAWFILE)
+        net = render(statements)
+    while True:
+        try:
+            return simulate_rewritten(net, vectors, cancel, statements=statements)
+        except QueueFullError:
+            if cancel.wait(0.5):
+                raise
+
+
+@app.post("/simulate/batch")
+def simulate_batch(body: dict = Body(...)):
+    """
+    body = { "netlists": ["...", {"name": "...", "netlist": "..."}],
+             "files": ["rc_filter.cir", ...] | "all", "vectors": [...],
+             "max_points": 2000, "plots": true, "stream": true }
+    Simula todos los netlists (y archivos de la biblioteca) en paralelo. Responde
+    NDJSON: una línea por circuito a medida que termina ({"type": "result", "index",
+    "name", ...} con el formato de /simulate) y una línea final con el resumen.
+    "plots": false omite los vectores (solo ok/logs). Con "stream": false devuelve
+    un único JSON con "results" en el orden pedido y "summary".
+    """
+    vectors = requested_vectors(body)
+    try:
+        max_points, method = requested_downsampling(body)
+        names, netlists = batch_netlists(body)
+    except (ValueError, TypeError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if not netlists:
+        return JSONResponse({"error": "No netlists to simulate"}, status_code=400)
+    if len(netlists) > BATCH_MAX_NETLISTS:
+        return JSONResponse({"error": f"Batch has {len(netlists)} netlists (limit {BATCH_MAX_NETLISTS})"},
+                            status_code=400)
+
+    events = run_batch(names, netlists, vectors, max_points, method, body.get("plots", True))
+    if body.get("stream", True):
+        lines = (json.dumps(to_json(event), ensure_ascii=False) + "\n" for event in events)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    results = [None] * len(netlists)
+    summary = None
+    for event in events:
+        if event["type"] == "result":
+            results[event["index"]] = event
+        else:
+            summary = event
+    return to_json({"results": results, "summary": summary})
+
+
+def batch_netlists(body):
+    """Nombres y netlists de un lote: los del body y los archivos pedidos (None si no existe)"""
+    names, netlists = [], []
+    for i, item in enumerate(body.get("netlists") or []):
+        name = f"netlist_{i + 1}"
+        if isinstance(item, dict):
+            name = item.get("name") or name
+            item = item.get("netlist")
+        if not isinstance(item, str) or not item.strip():
+            raise ValueError(f"netlists[{i}] must be a netlist string or {{\"name\", \"netlist\"}}")
+        names.append(name)
+        netlists.append(item)
+
+    files = body.get("files") or []
+    if files == "all":
+        circuit_index.refresh()
+        files = circuit_index.names()
+    elif isinstance(files, str):
+        files = [files]
+    for filename in files:
+        if not isinstance(filename, str):
+            raise ValueError("files must be a list of file names or \"all\"")
+        names.append(filename)
+        netlists.append(circuit_index.read(filename) if filename.endswith('.cir') else None)
+    return names, netlists
+
+
+def run_batch(names, netlists, vectors, max_points=None, method="minmax", include_plots=True):
+    """Simula el lote en paralelo; genera un evento por circuito terminado y el resumen final"""
+    start = time.monotonic()
+    counts = {"ok": 0, "failed": 0}
+    # Los archivos que no existen se informan sin ocupar un worker
+    missing = [i for i, net in enumerate(netlists) if net is None]
+    for i in missing:
+        counts["failed"] += 1
+        yield {"type": "result", "index": i, "name": names[i], "ok": False, "error": "File not found"}
+
+    pending = [i for i, net in enumerate(netlists) if net is not None]
+    for j, result in run_parallel([netlists[i] for i in pending], vectors, rewrite=True):
+        i = pending[j]
+        event = {"type": "result", "index": i, "name": names[i]}
+        if isinstance(result, Exception):
+            event.update(ok=False, error=str(result))
+        else:
+            if max_points and include_plots:
+                result = downsample_result(result, max_points, method)
+            if not include_plots:
+                result = {k: result[k] for k in ("ok", "logs", "result_id") if k in result}
+            event.update(result)
+        counts["ok" if event["ok"] else "failed"] += 1
+        yield event
+
+    yield {"type": "summary", "total": len(netlists), **counts,
+           "elapsed": round(time.monotonic() - start, 3)}
+
+
+@app.get("/simulate/queue")
+def simulation_queue_stats():
+    """Estado del planificador de ngspice (workers, cola, timeouts, rechazos)"""
+    return simulation_scheduler.stats()
+
+
+@app.get("/simulate/cache")
+def simulation_cache_stats():
+    """Contadores de la caché de simulaciones (hits/misses/evictions/tamaño)"""
+    return {**simulation_cache.stats(), "spill": spill_cache.stats()}
+
+
+@app.delete("/simulate/cache")
+def clear_simulation_cache():
+    """Vacía la caché de simulaciones en memoria y la de resultados en disco"""
+    simulation_cache.clear()
+    spill_cache.clear()
+    return {"success": True}
+
+
+@app.get("/chat/cache")
+def chat_cache_stats():
+    """Contadores de la caché de respuestas de /chat"""
+    return chat_cache.stats()
+
+
+@app.delete("/chat/cache")
+def clear_chat_cache():
+    """Vacía la caché de respuestas de /chat"""
+    chat_cache.clear()
+    return {"success": True}
+
+
+@app.get("/metrics")
+def metrics():
+    """Métricas en formato Prometheus (latencias por ruta, etapas, chat, cola y caché)"""
+    body = (render_metrics()
+            + render_gauges("spice_scheduler", simulation_scheduler.stats(), "Planificador de ngspice")
+            + render_gauges("spice_cache", simulation_cache.stats(), "Caché de simulaciones")
+            + render_gauges("spice_spill_cache", spill_cache.stats(), "Resultados de simulación en disco")
+            + render_gauges("chat_cache", chat_cache.stats(), "Caché de respuestas de /chat"))
+    return Response(body, media_type=METRICS_CONTENT_TYPE)
+
+
+def simulate_netlist(net, vectors=None, cancel=None, progress=None, spill=False):
+    """
+    Ejecuta ngspice sobre el netlist (o reutiliza la caché) y devuelve el resultado con arrays.
+    `cancel` (threading.Event) detiene la simulación si se activa; `progress(fracción)`
+    recibe el avance estimado a partir de la salida de ngspice. Con `spill`, un
+    rawfile de más de SIM_SPILL_MB se decodifica a disco (spill_cache).
+    """
+    with stage("rewrite"):
+        statements = rewrite_statements(net, RAWFILE)
+        modified_net = render(statements)
+    return simulate_rewritten(modified_net, vectors, cancel, progress, spill, statements)
+
+
+def cached_result(key):
+    """Resultado en caché (decodificado a disco o en memoria) o None"""
+    # spill_cache primero: no cuenta fallos, así simulation_cache solo registra un
+    # fallo cuando el resultado no está en ninguno de los dos niveles
+    cached = spill_cache.get(key)
+    if cached is None:
+        cached = simulation_cache.get(key)
+    return cached
+
+
+def simulate_rewritten(modified_net, vectors=None, cancel=None, progress=None, spill=False,
+                       statements=None):
+    """
+    Igual que simulate_netlist para un netlist ya reescrito con rewrite_netlist(net, RAWFILE).
+    `statements` (el AST de ese netlist, si se tiene) evita volver a tokenizarlo.
+    """
+    engine = get_shared_engine()
+    # Netlists idénticos (misma versión de ngspice y mismo motor) reutilizan el resultado anterior
+    with stage("cache_lookup"):
+        cache_key = simulation_cache.key(statements or modified_net, vectors,
+                                         "subprocess" if engine is None else "shared")
+        cached = cached_result(cache_key)
+    if cached is not None:
+        return {**cached, "result_id": cache_key}
+
     with tempfile.TemporaryDirectory() as td:
         sp = os.path.join(td, "circuit.sp")
         log = os.path.join(td, "out.log")
-        raw = os.path.join(td, "output.raw")
-        
-        # Procesar el netlist para generar archivo rawfile
-        lines = net.strip().split('\n')
-        modified_lines = []
-        in_control_block = False
-        has_write_command = False
-        has_run_command = False
-        analysis_commands = []  # Para almacenar comandos de análisis encontrados en .control
-        
-        for line in lines:
-            line_lower = line.lower().strip()
-            original_line = line
-            
-            # Detectar inicio/fin de bloque .control
-            if line_lower.startswith('.control'):
-                in_control_block = True
-                modified_lines.append(original_line)
-                continue
-            elif line_lower.startswith('.endc'):
-                in_control_block = False
-                # Asegurar que tenemos run y write antes de cerrar
-                if not has_run_command:
-                    modified_lines.append('run')
-                if not has_write_command:
-                    modified_lines.append(f'write {raw}')
-                modified_lines.append(original_line)
-                continue
-            
-            # Dentro de bloque .control
-            if in_control_block:
-                # Detectar comando run existente
-                if line_lower.startswith('run'):
-                    has_run_command = True
-                    modified_lines.append(original_line)
-                # Mover comandos de análisis fuera del bloque .control
-                elif any(line_lower.startswith(cmd) for cmd in ['ac ', 'tran ', 'dc ', 'op']):
-                    # Asegurar que el comando tenga punto al inicio
-                    if not original_line.strip().startswith('.'):
-                        analysis_commands.append('.' + original_line.strip())
-                    else:
-                        analysis_commands.append(original_line)
-                    continue  # No agregar aquí, se agregará antes del .control
-                # Remover comandos plot ya que no funcionan en batch
-                elif line_lower.startswith('plot '):
-                    continue  # Skip plot commands
-                # Detectar comandos write existentes
-                elif line_lower.startswith('write '):
-                    has_write_command = True
-                    modified_lines.append(f'write {raw}')
-                else:
-                    modified_lines.append(original_line)
-            else:
-                modified_lines.append(original_line)
-        
-        # Insertar comandos de análisis antes del bloque .control o antes de .end
-        if analysis_commands:
-            final_lines = []
-            control_inserted = False
-            
-            for line in modified_lines:
-                if line.lower().strip().startswith('.control') and not control_inserted:
-                    # Insertar análisis antes del .control
-                    final_lines.extend(analysis_commands)
-                    final_lines.append(line)
-                    control_inserted = True
-                elif line.lower().strip() == '.end' and not control_inserted:
-                    # Si no hay .control, insertar antes de .end
-                    final_lines.extend(analysis_commands)
-                    final_lines.append('.control')
-                    final_lines.append('run')
-                    final_lines.append(f'write {raw}')
-                    final_lines.append('.endc')
-                    final_lines.append(line)
-                    control_inserted = True
-                else:
-                    final_lines.append(line)
-            
-            modified_lines = final_lines
-        
-        # Si no hay bloque .control, agregarlo
-        if not any('.control' in line.lower() for line in lines):
-            for i, line in enumerate(modified_lines):
-                if line.lower().strip() == '.end':
-                    control_block = ['.control', 'run', f'write {raw}', '.endc']
-                    modified_lines = modified_lines[:i] + control_block + modified_lines[i:]
-                    break
-        
-        modified_net = '\n'.join(modified_lines)
-        
-        with open(sp, "w") as f: 
-            f.write(modified_net)
-        
-        # Ejecutar ngspice
-        res = subprocess.run(["ngspice", "-b", "-o", log, sp], capture_output=True, text=True)
-        ok = (res.returncode == 0)
-        logs = open(log).read() if os.path.exists(log) else (res.stderr or res.stdout)
-
-        # Leer datos del archivo rawfile
-        xvals, yvals = [], []
-        plot_title = "Simulation Results"
-        x_label = "Frequency (Hz)"
-        y_label = "Magnitude"
-        
-        if os.path.exists(raw):
+        raw = os.path.join(td, RAWFILE)
+
+        if engine is not None:
+            # Motor en memoria (libngspice): los vectores se leen sin pasar por el rawfile
+            circuit = [line for line in modified_net.split('\n') if line.strip() != f'write {RAWFILE}']
+            with stage("ngspice"):
+                job = simulation_scheduler.call(
+                    lambda: engine.run(circuit, cancel, vectors, circuit[0].strip()), cancel)
+            logs = job["stdout"]
+            with stage("result"):
+                data = build_simulation_result(job.get("plots", []), vectors)
+        else:
+            with open(sp, "w") as f: 
+                f.write(modified_net.replace(f'write {RAWFILE}', f'write {raw}'))
+
+            # Leer el avance de la salida de ngspice mientras corre
+            err = os.path.join(td, "err.log") if progress else None
+            on_tick = None
+            if progress:
+                span = analysis_span(statements or modified_net)
+
+                def on_tick():
+                    fraction = parse_progress(read_tail(log) + read_tail(err), span)
+                    if fraction is not None:
+                        progress(fraction)
+
+            # Ejecutar ngspice (con límite de concurrencia, tiempo y memoria)
+            with stage("ngspice"):
+                job = simulation_scheduler.run(["ngspice", "-b", "-o", log, sp], cancel, on_tick, err)
+            logs = open(log).read() if os.path.exists(log) else (job["stderr"] or job["stdout"])
+            # Rawfile grande: decodificar a disco en lugar de a memoria
+            spill_dir = None
+            if (spill and SIM_SPILL_MB > 0 and os.path.exists(raw)
+                    and os.path.getsize(raw) > SIM_SPILL_MB * 1024 * 1024):
+                spill_dir = spill_cache.reserve()
+            with stage("rawfile"):
+                data = read_simulation_result(raw, vectors, spill_dir)
+            if spill_dir and not data.get("spilled"):
+                spill_cache.discard(spill_dir)
+
+        ok = job["status"] == "ok" and job["returncode"] == 0
+        if job["status"] == "timeout":
+            logs += f"\nSimulation stopped: exceeded the {simulation_scheduler.timeout}s time limit\n"
+
+        result = {"ok": ok, "logs": logs, **data}
+        if data.get("spilled"):
+            # Los archivos quedan en spill_cache; los de un resultado con error se borran
+            # ya (los arrays abiertos siguen siendo válidos hasta enviar la respuesta)
+            if not ok:
+                spill_cache.discard(spill_dir)
+                return result
+            with stage("cache_store"):
+                stored = spill_cache.put(cache_key, result, spill_dir)
+            if stored:
+                return {**result, "result_id": cache_key}
+        elif ok:
+            with stage("cache_store"):
+                stored = simulation_cache.put(cache_key, result)
+            # result_id permite pedir después otros rangos del resultado (/simulate/results),
+            # solo si quedó en caché
+            if stored:
+                return {**result, "result_id": cache_key}
+        return result
+
+
+def get_shared_engine():
+    """
+    Grupo de workers libngspice si SIM_ENGINE=shared (se crea al primer uso).
+    Devuelve None para usar un proceso ngspice por simulación, también si
+    libngspice no se puede cargar.
+    """
+    global shared_engine, shared_engine_failed
+    if SIM_ENGINE != "shared" or shared_engine_failed:
+        return None
+
+    with shared_engine_lock:
+        if shared_engine is None and not shared_engine_failed:
             try:
-                # Primero, verificar si el archivo es binario o ASCII
-                with open(raw, 'rb') as f:
-                    first_bytes = f.read(1000)  # Leer más bytes para el header
-                    is_binary = b'Binary:' in first_bytes
-                
-                if is_binary:
-                    # Manejar archivo rawfile binario
-                    import struct
-                    
-                    with open(raw, 'rb') as f:
-                        # Leer header ASCII
-                        header_lines = []
-                        current_line = b''
-                        
-                        while True:
-                            byte = f.read(1)
-                            if not byte:
-                                break
-                            if byte == b'\n':
-                                line = current_line.decode('ascii', errors='ignore').strip()
-                                header_lines.append(line)
-                                current_line = b''
-                                
-                                # Buscar el final del header
-                                if line.startswith('Binary:') or line.startswith('Values:'):
-                                    break
-                            else:
-                                current_line += byte
-                        
-                        # Procesar header
-                        num_variables = 0
-                        num_points = 0
-                        variables = []
-                        
-                        for line in header_lines:
-                            if line.startswith('Title:'):
-                                plot_title = line.split(':', 1)[1].strip()
-                            elif line.startswith('No. Variables:'):
-                                num_variables = int(line.split(':')[1].strip())
-                            elif line.startswith('No. Points:'):
-                                num_points = int(line.split(':')[1].strip())
-                            elif line.startswith('Variables:'):
-                                continue
-                            elif '\t' in line and len(line.split('\t')) >= 3:
-                                parts = line.split('\t')
-                                if len(parts) >= 3 and parts[0].isdigit():
-                                    variables.append({
-                                        'index': int(parts[0]),
-                                        'name': parts[1],
-                                        'type': parts[2]
-                                    })
-                        
-                        # Leer datos binarios
-                        if num_variables >= 2 and num_points > 0:
-                            # Buscar donde empiezan los datos binarios
-                            binary_start = f.tell()
-                            
-                            # Verificar si los datos son complejos
-                            is_complex = any('complex' in line.lower() for line in header_lines)
-                            
-                            if is_complex:
-                                # Datos complejos: cada valor son 16 bytes (real + imaginaria)
-                                bytes_per_value = 16
-                            else:
-                                # Datos reales: cada valor son 8 bytes
-                                bytes_per_value = 8
-                            
-                            bytes_per_point = num_variables * bytes_per_value
-                            
-                            for point in range(num_points):
-                                try:
-                                    # Leer datos para este punto
-                                    point_data = f.read(bytes_per_point)
-                                    if len(point_data) < bytes_per_point:
-                                        break
-                                    
-                                    if is_complex:
-                                        # Desempaquetar como complex doubles
-                                        # Cada valor complejo son 2 doubles: real + imaginaria
-                                        raw_values = struct.unpack(f'{num_variables * 2}d', point_data)
-                                        
-                                        # Convertir a valores complejos y tomar magnitud
-                                        values = []
-                                        for i in range(0, len(raw_values), 2):
-                                            real = raw_values[i]
-                                            imag = raw_values[i + 1]
-                                            magnitude = math.sqrt(real * real + imag * imag)
-                                            values.append(magnitude)
-                                    else:
-                                        # Desempaquetar como doubles reales
-                                        values = struct.unpack(f'{num_variables}d', point_data)
-                                    
-                                    if len(values) >= 3:
-                                        x_val = values[0]  # Frecuencia (primera variable)
-                                        y_val = values[2]  # v(out) - tercera variable (índice 2)
-                                        
-                                        # Para análisis AC, convertir magnitud a dB
-                                        if 'ac' in plot_title.lower() and y_val > 0:
-                                            y_val = 20 * math.log10(y_val)
-                                        
-                                        xvals.append(x_val)
-                                        yvals.append(y_val)
-                                        
-                                except struct.error as e:
-                                    print(f"Struct error at point {point}: {e}")
-                                    break
-                
-                else:
-                    # Manejar archivo rawfile ASCII (código anterior)
-                    with open(raw, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                        
-                    lines = content.split('\n')
-                    variables = []
-                    num_variables = 0
-                    
-                    for i, line in enumerate(lines):
-                        line = line.strip()
-                        
-                        if line.startswith('Title:'):
-                            plot_title = line.split(':', 1)[1].strip()
-                        elif line.startswith('No. Variables:'):
-                            num_variables = int(line.split(':')[1].strip())
-                        elif line.startswith('Variables:'):
-                            # Leer variables
-                            var_idx = i + 1
-                            variables = []
-                            while var_idx < len(lines) and var_idx < i + 1 + num_variables:
-                                var_line = lines[var_idx].strip()
-                                if var_line and not var_line.startswith('Values:'):
-                                    parts = var_line.split('\t')
-                                    if len(parts) >= 3:
-                                        variables.append({
-                                            'index': int(parts[0]),
-                                            'name': parts[1],
-                                            'type': parts[2]
-                                        })
-                                var_idx += 1
-                            break
-                    
-                    # Buscar datos
-                    for i, line in enumerate(lines):
-                        if line.strip().startswith('Values:'):
-                            data_idx = i + 1
-                            current_point = {}
-                            
-                            while data_idx < len(lines):
-                                data_line = lines[data_idx].strip()
-                                if not data_line:
-                                    data_idx += 1
-                                    continue
-                                    
-                                try:
-                                    parts = data_line.replace('\t', ' ').split()
-                                    if len(parts) >= 2:
-                                        var_idx = int(parts[0])
-                                        value = float(parts[1])
-                                        current_point[var_idx] = value
-                                        
-                                        if len(current_point) == num_variables:
-                                            if 0 in current_point and 1 in current_point:
-                                                x_val = current_point[0]
-                                                y_val = current_point[1]
-                                                
-                                                if 'ac' in plot_title.lower() and y_val > 0:
-                                                    y_val = 20 * math.log10(abs(y_val))
-                                                
-                                                xvals.append(x_val)
-                                                yvals.append(y_val)
-                                            
-                                            current_point = {}
-                                            
-                                except (ValueError, IndexError):
-                                    pass
-                                    
-                                data_idx += 1
-                            break
-                
-                # Configurar etiquetas basadas en las variables
-                if len(variables) >= 2:
-                    x_var = variables[0]['name'].lower()
-                    y_var = variables[1]['name'].lower()
-                    
-                    if 'frequency' in x_var:
-                        x_label = "Frequency (Hz)"
-                        if 'ac' in plot_title.lower():
-                            y_label = "Magnitude (dB)"
-                        else:
-                            y_label = "Magnitude (V)"
-                    elif 'time' in x_var:
-                        x_label = "Time (s)"
-                        y_label = "Voltage (V)"
-                    
-                    # Usar nombre real de la variable si es descriptivo
-                    if len(variables[1]['name']) > 4:  # Evitar nombres como v(1)
-                        y_label = variables[1]['name']
-                    
-            except Exception as e:
-                print(f"Error reading rawfile: {e}")
-                # Fallback: usar datos vacíos
-                pass
+                shared_engine = SharedSpicePool(
+                    size=simulation_scheduler.workers,
+                    timeout=simulation_scheduler.timeout,
+                    memory_mb=simulation_scheduler.memory_mb,
+                )
+            except OSError as e:
+                print(f"libngspice unavailable, falling back to ngspice subprocess: {e}")
+                shared_engine_failed = True
+    return shared_engine
+
+
+def read_simulation_result(raw, vectors=None, spill_dir=None):
+    """
+    Lee el rawfile y arma x/y, etiquetas y la lista completa de plots
+    (decodificados a archivos de `spill_dir` si se indica)
+    """
+    raw_plots = []
+    spilled = False
+    if os.path.exists(raw):
+        spilled = spill_dir is not None
+        try:
+            raw_plots = read_rawfile(raw, vectors, spill_dir)
+        except Exception as e:
+            print(f"Error reading rawfile: {e}")
+            # Fallback: usar datos vacíos
+            spilled = False
+    result = build_simulation_result(raw_plots, vectors)
+    if spilled:
+        result["spilled"] = True
+    return result
+
+
+def build_simulation_result(raw_plots, vectors=None):
+    """Arma x/y, etiquetas y la lista completa de plots a partir de los plots decodificados"""
+    xvals, yvals = [], []
+    phase_vals = None
+    plot_title = "Simulation Results"
+    x_label = "Frequency (Hz)"
+    y_label = "Magnitude"
+
+    plots = [plot_to_dict(plot) for plot in raw_plots]
+
+    # Plot principal para x/y: el primero con más de un punto (.op tiene uno solo)
+    main = next((p for p in raw_plots if len(p["data"]) > 1),
+                raw_plots[0] if raw_plots else None)
+
+    if main:
+        if main["title"]:
+            plot_title = main["title"]
+
+        variables = main["variables"]
+        names = main["data"].dtype.names
+        is_ac = 'complex' in main["flags"]
+
+        if len(names) >= 2:
+            # Vector pedido, o v(out) por convención (tercera variable)
+            y_index = 1 if vectors or len(names) < 3 else 2
+            x = magnitude(main["data"][names[0]])  # Frecuencia / tiempo
+            y = main["data"][names[y_index]]
+            # Para análisis AC, convertir magnitud a dB (y la fase en grados aparte)
+            if is_ac:
+                phase_vals = phase(y)
+            y = to_db(y) if is_ac else magnitude(y)
 
-        return {
-            "ok": ok, 
-            "logs": logs, 
-            "x": xvals, 
-            "y": yvals,
-            "plot_title": plot_title,
-            "x_label": x_label,
-            "y_label": y_label
-        }
+            xvals = x
+            yvals = y
+
+            # Configurar etiquetas basadas en las variables
+            x_var = variables[0]['name'].lower()
+            if 'frequency' in x_var:
+                x_label = "Frequency (Hz)"
+                y_label = "Magnitude (dB)" if is_ac else "Magnitude (V)"
+            elif 'time' in x_var:
+                x_label = "Time (s)"
+                y_label = "Voltage (V)"
+
+            # Usar nombre real de la variable si es descriptivo
+            if len(variables[y_index]['name']) > 4:  # Evitar nombres como v(1)
+                y_label = variables[y_index]['name']
+
+    result = {
+        "x": xvals, 
+        "y": yvals,
+        "plot_title": plot_title,
+        "x_label": x_label,
+        "y_label": y_label,
+        "plots": plots
+    }
+    if phase_vals is not None:
+        result["phase"] = phase_vals  # Solo AC: fase (grados) del mismo vector que y
+    return result
+
+
+def plot_to_dict(plot):
+    """Convierte un plot del rawfile a un dict con sus vectores (arrays) por nombre"""
+    vectors = {}
+    for var, name in zip(plot["variables"], plot["data"].dtype.names):
+        values = plot["data"][name]
+        if np.iscomplexobj(values):
+            vectors[name] = {"type": var['type'], "real": values.real, "imag": values.imag}
+        else:
+            vectors[name] = {"type": var['type'], "values": values}
+
+    return {
+        "name": plot["plotname"],
+        "title": plot["title"],
+        "points": len(plot["data"]),
+        "scale": plot["data"].dtype.names[0],
+        "vectors": vectors
+    }
 
 
 @app.get("/files")
-def list_files():
-    """Lista los archivos .cir en el directorio circuits_generated"""
+def list_files(limit: int = FILES_PAGE_SIZE, cursor: str = None, offset: int = 0,
+               q: str = None, element: str = None, analysis: str = None):
+    """
+    Lista los archivos .cir en el directorio circuits_generated (más reciente primero).
+    Pagina con `cursor` ("next_cursor" de la página anterior) u `offset`; filtra por
+    nombre o título (`q`), tipo de elemento (`element`, p. ej. "q") y análisis (`analysis`).
+    """
     try:
-        files = []
-        if os.path.exists(CIRCUITS_DIR):
-            for filename in os.listdir(CIRCUITS_DIR):
-                if filename.endswith('.cir'):
-                    filepath = os.path.join(CIRCUITS_DIR, filename)
-                    files.append({
-                        "name": filename,
-                        "path": filepath,
-                        "modified": os.path.getmtime(filepath)
-                    })
-        # Ordenar por fecha de modificación (más reciente primero)
-        files.sort(key=lambda x: x["modified"], reverse=True)
-        return {"files": files}
+        circuit_index.refresh()
+        return circuit_index.list(max(1, min(limit, 1000)), cursor, max(offset, 0),
+                                  q, element, analysis)
+    except ValueError as e:
+        return JSONResponse({"files": [], "error": str(e)}, status_code=400)
     except Exception as e:
         return {"files": [], "error": str(e)}
 
@@ -491,13 +1079,10 @@ def list_files():
 def get_file_content(filename: str):
     """Obtiene el contenido de un archivo específico"""
     try:
-        filepath = os.path.join(CIRCUITS_DIR, filename)
-        if not os.path.exists(filepath) or not filename.endswith('.cir'):
+        content = circuit_index.read(filename) if filename.endswith('.cir') else None
+        if content is None:
             return {"error": "File not found"}
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
         return {"content": content, "filename": filename}
     except Exception as e:
         return {"error": str(e)}
@@ -510,11 +1095,8 @@ def save_file_content(filename: str, body: dict = Body(...)):
         if not filename.endswith('.cir'):
             return {"error": "Only .cir files are allowed"}
         
-        filepath = os.path.join(CIRCUITS_DIR, filename)
         content = body.get("content", "")
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        circuit_index.save(filename, content)
         
         return {"success": True, "filename": filename}
     except Exception as e:
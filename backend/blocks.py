@@ -0,0 +1,68 @@
+"""
+Detección incremental de bloques de código SPICE en la respuesta del LLM.
+
+El texto se consume a medida que llegan los deltas del stream: solo se guardan
+la línea incompleta y las líneas del bloque abierto, y cada bloque se devuelve
+en cuanto aparece su cerca de cierre, sin re-escanear la respuesta completa.
+"""
+
+# Cercas de apertura que se consideran SPICE (``` sin lenguaje o ```spice)
+_SPICE_FENCES = ('```', '```spice')
+
+
+class SpiceBlockExtractor:
+    """feed(texto) -> lista de bloques SPICE que se cerraron con ese texto"""
+
+    def __init__(self):
+        self._partial = []  # fragmentos de la línea en curso
+        self._block = None  # líneas del bloque abierto
+        self._fence = None  # None (fuera de bloque), "spice" u "other"
+
+    def feed(self, text):
+        """Agrega texto y devuelve el código de los bloques SPICE completados"""
+        if '\n' not in text:
+            self._partial.append(text)
+            return []
+
+        lines = text.split('\n')
+        self._partial.append(lines[0])
+        lines[0] = ''.join(self._partial)
+        self._partial = [lines.pop()]
+
+        blocks = []
+        for line in lines:
+            block = self._line(line)
+            if block is not None:
+                blocks.append(block)
+        return blocks
+
+    def flush(self):
+        """Fin del texto: procesa la última línea (un cierre sin salto de línea final)"""
+        line = ''.join(self._partial)
+        self._partial = []
+        block = self._line(line) if line else None
+        return [block] if block is not None else []
+
+    def _line(self, line):
+        stripped = line.strip()
+        if self._fence is None:
+            if stripped.startswith('```'):
+                self._fence = "spice" if stripped.lower() in _SPICE_FENCES else "other"
+                self._block = []
+            return None
+
+        if stripped.startswith('```') and stripped.strip('`') == '':
+            fence, block = self._fence, self._block
+            self._fence = None
+            self._block = None
+            return '\n'.join(block) if fence == "spice" else None
+
+        if self._fence == "spice":
+            self._block.append(line)
+        return None
+
+
+def extract_spice_blocks(content):
+    """Bloques SPICE de un texto completo"""
+    extractor = SpiceBlockExtractor()
+    return extractor.feed(content) + extractor.flush()
@@ -0,0 +1,264 @@
+"""
+Caché de resultados de simulación direccionada por contenido.
+
+La clave es el hash del netlist reescrito en forma canónica, la versión de ngspice,
+el motor y los vectores pedidos. Hay un nivel en memoria (LRU acotado en bytes) y un
+nivel opcional en disco para conservar resultados entre reinicios.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from .netlist import canonical_netlist
+
+
+@lru_cache(maxsize=1)
+def ngspice_version():
+    """Versión de ngspice instalada (se consulta una sola vez)"""
+    try:
+        res = subprocess.run(["ngspice", "--version"], capture_output=True, text=True, timeout=10)
+        for line in res.stdout.splitlines():
+            if 'ngspice' in line.lower():
+                return line.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return "unknown"
+
+
+def result_size(value):
+    """Tamaño aproximado en bytes de un resultado (arrays + cadenas)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(result_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_size(v) for v in value)
+    if isinstance(value, str):
+        return len(value)
+    return 8
+
+
+class SimulationCache:
+    """LRU en memoria con límite de bytes y nivel opcional en disco"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # clave -> (resultado, tamaño)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, netlist, vectors=None, engine="subprocess"):
+        """
+        Clave de caché para un netlist reescrito (texto o sentencias de
+        parse_netlist, para no volver a tokenizarlo), una selección de vectores
+        y el motor que lo simula
+        """
+        h = hashlib.sha256()
+        h.update(ngspice_version().encode('utf-8'))
+        h.update(b'\0')
+        h.update(engine.encode('utf-8'))
+        h.update(b'\0')
+        h.update(canonical_netlist(netlist).encode('utf-8'))
+        h.update(b'\0')
+        h.update(','.join(sorted(v.lower() for v in vectors or [])).encode('utf-8'))
+        return h.hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pkl")
+
+    def get(self, key):
+        """Devuelve el resultado en caché o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    result = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                result = None
+            if result is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store(key, result)
+                return result
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """
+        Guarda un resultado en memoria (y en disco si está configurado).
+        Devuelve False si no quedó en ningún nivel (p. ej. más grande que max_bytes).
+        """
+        stored = self._store(key, result)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Escritura atómica: archivo temporal + rename
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+                stored = True
+            except OSError as e:
+                print(f"Error writing simulation cache: {e}")
+        return stored
+
+    def _store(self, key, result):
+        size = result_size(result)
+        if size > self.max_bytes:
+            return False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def clear(self):
+        """Vacía el nivel en memoria (el nivel en disco se conserva)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Contadores para dimensionar la caché"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir,
+            }
+
+
+class SpillCache:
+    """
+    Resultados decodificados a disco (np.memmap, ver read_rawfile) indexados por
+    clave de caché, con límite de bytes en disco y LRU. Cada resultado vive en su
+    propio directorio, que se borra al descartarlo; los arrays ya abiertos siguen
+    siendo válidos hasta que se liberan.
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024, root=None):
+        self.max_bytes = max_bytes
+        self.root = root
+        self._dir = None
+        self._entries = OrderedDict()  # clave -> (resultado, tamaño, directorio)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.evictions = 0
+
+    def reserve(self):
+        """Crea un directorio vacío para decodificar un resultado"""
+        with self._lock:
+            if self._dir is None:
+                if self.root:
+                    os.makedirs(self.root, exist_ok=True)
+                self._dir = tempfile.mkdtemp(prefix="spice-spill-", dir=self.root)
+            return tempfile.mkdtemp(dir=self._dir)
+
+    def get(self, key):
+        """Devuelve el resultado en disco o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, result, directory):
+        """
+        Guarda el resultado decodificado en `directory` (de reserve). Devuelve False
+        si no cabe en max_bytes; en ese caso el directorio se borra enseguida.
+        """
+        size = sum(entry.stat().st_size for entry in os.scandir(directory))
+        if size > self.max_bytes:
+            shutil.rmtree(directory, ignore_errors=True)
+            return False
+
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+                evicted.append(old[2])
+            self._entries[key] = (result, size, directory)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, evicted_dir) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                evicted.append(evicted_dir)
+        for path in evicted:
+            shutil.rmtree(path, ignore_errors=True)
+        return True
+
+    def discard(self, directory):
+        """Borra un directorio de reserve que no llegó a guardarse"""
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def clear(self):
+        """Vacía la caché y borra sus archivos"""
+        with self._lock:
+            directories = [entry[2] for entry in self._entries.values()]
+            self._entries.clear()
+            self._bytes = 0
+        for path in directories:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        """Borra el directorio de la caché (al cerrar la aplicación)"""
+        self.clear()
+        with self._lock:
+            if self._dir is not None:
+                shutil.rmtree(self._dir, ignore_errors=True)
+                self._dir = None
+
+    def stats(self):
+        """Contadores para dimensionar la caché"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,98 @@
+"""
+Caché de respuestas de /chat.
+
+Los prompts de ejemplo y los system prompts fijos se repiten mucho; cada
+repetición cuesta una ida y vuelta a OpenRouter y consume el límite del plan
+gratuito. La clave es el hash de (modelo, mensajes, stream); las entradas caducan
+a los `ttl` segundos y, por encima de `max_bytes`, se descarta la usada hace más
+tiempo (LRU).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import result_size
+
+
+class ChatCache:
+    """LRU en memoria con caducidad (TTL) y límite de bytes; ttl <= 0 la desactiva"""
+
+    def __init__(self, ttl=0, max_bytes=32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> (valor, tamaño, vence)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    @staticmethod
+    def key(model, messages, stream=False):
+        """Clave de caché para un modelo y una lista de mensajes"""
+        data = json.dumps([model, messages, bool(stream)], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Devuelve la respuesta en caché (si no caducó) o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """Guarda una respuesta completa durante `ttl` segundos"""
+        size = result_size(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _remove(self, key):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+
+    def clear(self):
+        """Vacía la caché"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Contadores para dimensionar la caché"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,161 @@
+"""
+Reducción de puntos de las trazas para graficar.
+
+"minmax" conserva el mínimo y el máximo de cada tramo (picos y glitches de un
+transitorio no desaparecen) y está completamente vectorizado. "lttb"
+(Largest-Triangle-Three-Buckets) conserva mejor la forma visual de curvas
+suaves; recorre los tramos en Python pero opera sobre cada tramo con NumPy.
+Los vectores de un mismo plot se reducen con los mismos índices para que
+sigan alineados con la escala.
+"""
+import math
+
+import numpy as np
+
+METHODS = ("minmax", "lttb")
+
+
+def _values(vector):
+    """Valores reales para elegir puntos (magnitud si el vector es complejo)"""
+    return np.abs(vector) if np.iscomplexobj(vector) else np.asarray(vector, dtype=float)
+
+
+def minmax_indices(y, buckets):
+    """Índices del mínimo y máximo de cada uno de `buckets` tramos (más el primero y el último)"""
+    n = len(y)
+    if n <= 2 * buckets + 2:
+        return np.arange(n)
+
+    inner = y[1:-1]
+    size = math.ceil(len(inner) / buckets)
+    buckets = math.ceil(len(inner) / size)
+    # Rellenar con NaN hasta un múltiplo del tramo para operar sobre una matriz
+    padded = np.full(buckets * size, np.nan)
+    padded[:len(inner)] = inner
+    table = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size + 1
+    # NaN (relleno o huecos de la traza) nunca es mínimo ni máximo; un tramo todo NaN
+    # devuelve su primer punto en lugar de fallar como nanargmin/nanargmax
+    missing = np.isnan(table)
+    lows = np.where(missing, np.inf, table).argmin(axis=1) + offsets
+    highs = np.where(missing, -np.inf, table).argmax(axis=1) + offsets
+    return np.unique(np.concatenate(([0], lows, highs, [n - 1])))
+
+
+def lttb_indices(x, y, buckets):
+    """Índices elegidos por LTTB para `buckets` tramos (más el primero y el último)"""
+    n = len(y)
+    if n <= buckets + 2:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, buckets + 1).astype(int)
+    selected = np.empty(buckets + 2, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(buckets):
+        start, stop = edges[i], edges[i + 1]
+        # Tercer vértice: promedio del tramo siguiente (o el último punto)
+        if i + 1 < buckets:
+            nxt = slice(edges[i + 1], edges[i + 2])
+            cx, cy = x[nxt].mean(), y[nxt].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def select_indices(scale, vectors, max_points, method="minmax"):
+    """Índices comunes para reducir a lo sumo a `max_points` puntos todos los vectores"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    n = len(scale)
+    if n <= max_points or not vectors:
+        return None
+
+    x = _values(scale)
+    # Cada vector aporta sus puntos; si la unión supera max_points se recorta abajo
+    per_vector = max(max_points // len(vectors), 3)
+    chosen = []
+    for vector in vectors:
+        y = _values(vector)
+        if method == "minmax":
+            chosen.append(minmax_indices(y, max((per_vector - 2) // 2, 1)))
+        else:
+            chosen.append(lttb_indices(x, y, max(per_vector - 2, 1)))
+    indices = np.unique(np.concatenate(chosen))
+    if len(indices) > max_points:
+        # Muchos vectores: submuestreo uniforme de la unión (conserva el primero y el último)
+        indices = indices[np.unique(np.linspace(0, len(indices) - 1, max_points).astype(np.int64))]
+    return indices
+
+
+def _take(vector, indices):
+    if "values" in vector:
+        return {**vector, "values": vector["values"][indices]}
+    return {**vector, "real": vector["real"][indices], "imag": vector["imag"][indices]}
+
+
+def _complex(vector):
+    if "values" in vector:
+        return vector["values"]
+    return vector["real"] + 1j * vector["imag"]
+
+
+def downsample_plot(plot, max_points, method="minmax"):
+    """Copia del plot (formato plot_to_dict) reducida a `max_points` puntos"""
+    scale = plot["vectors"][plot["scale"]]
+    others = [_complex(v) for name, v in plot["vectors"].items() if name != plot["scale"]]
+    indices = select_indices(_complex(scale), others, max_points, method)
+    if indices is None:
+        return plot
+    return {
+        **plot,
+        "points": len(indices),
+        "source_points": plot["points"],
+        "vectors": {name: _take(v, indices) for name, v in plot["vectors"].items()},
+    }
+
+
+def downsample_result(result, max_points, method="minmax"):
+    """Copia del resultado de simulación con x/y y cada plot reducidos (no modifica el original)"""
+    reduced = dict(result)
+    x, y = result.get("x"), result.get("y")
+    if isinstance(x, np.ndarray) and len(x) > max_points:
+        indices = select_indices(x, [y], max_points, method)
+        reduced["x"], reduced["y"] = x[indices], y[indices]
+        if isinstance(result.get("phase"), np.ndarray):
+            reduced["phase"] = result["phase"][indices]
+    reduced["plots"] = [downsample_plot(plot, max_points, method) for plot in result.get("plots", [])]
+    reduced["downsampled"] = {"method": method, "max_points": max_points}
+    return reduced
+
+
+def slice_result(result, x_min=None, x_max=None):
+    """Copia del resultado con solo los puntos cuya escala está en [x_min, x_max]"""
+    def mask_for(scale):
+        values = np.real(scale)
+        mask = np.ones(len(values), dtype=bool)
+        if x_min is not None:
+            mask &= values >= x_min
+        if x_max is not None:
+            mask &= values <= x_max
+        return mask
+
+    sliced = dict(result)
+    if isinstance(result.get("x"), np.ndarray):
+        mask = mask_for(result["x"])
+        sliced["x"], sliced["y"] = result["x"][mask], result["y"][mask]
+        if isinstance(result.get("phase"), np.ndarray):
+            sliced["phase"] = result["phase"][mask]
+
+    plots = []
+    for plot in result.get("plots", []):
+        mask = mask_for(_complex(plot["vectors"][plot["scale"]]))
+        plots.append({**plot, "points": int(mask.sum()),
+                      "vectors": {name: _take(v, mask) for name, v in plot["vectors"].items()}})
+    sliced["plots"] = plots
+    sliced["range"] = {"x_min": x_min, "x_max": x_max}
+    return sliced
@@ -0,0 +1,156 @@
+"""
+Codificación de resultados de simulación para la respuesta HTTP.
+
+Los resultados se construyen con arrays de NumPy; aquí se convierten a JSON
+(listas de floats) o al formato binario compacto:
+
+    [uint32 LE: largo del header][header JSON, relleno a múltiplo de 8][buffers]
+
+Cada array se reemplaza en el header por {"buffer": i}, y "buffers" lista
+{"offset", "length", "shape", "dtype"} de cada uno (offset relativo al inicio
+de los buffers, alineado a 8 bytes; arrays 2-D fila por fila). El cliente puede
+crear Float64Array/Float32Array directamente sobre la respuesta sin parsear.
+
+iter_binary/iter_json generan la misma respuesta por tramos, para enviarla con
+StreamingResponse sin armarla entera en memoria (resultados en np.memmap).
+"""
+import json
+import math
+
+import numpy as np
+
+BINARY_MEDIA_TYPE = "application/x-ngspice-vectors"
+
+_DTYPES = {"float64": np.dtype('<f8'), "float32": np.dtype('<f4')}
+DTYPES = tuple(_DTYPES)
+
+# Puntos de cada array que se convierten de una vez en las respuestas por tramos
+STREAM_CHUNK_POINTS = 256 * 1024
+
+
+def wants_binary(accept):
+    """True si el header Accept pide el formato binario"""
+    return BINARY_MEDIA_TYPE in (accept or "")
+
+
+def to_json(result):
+    """
+    Reemplaza recursivamente los arrays de NumPy por listas de Python; NaN e
+    infinitos pasan a None (null), que JSON sí admite
+    """
+    if isinstance(result, np.ndarray):
+        return _to_list(result)
+    if isinstance(result, dict):
+        return {k: to_json(v) for k, v in result.items()}
+    if isinstance(result, (list, tuple)):
+        return [to_json(v) for v in result]
+    return _finite(result)
+
+
+def _to_list(value):
+    if value.dtype.kind == 'f':
+        invalid = ~np.isfinite(value)
+        if invalid.any():
+            value = value.astype(object)
+            value[invalid] = None
+    return value.tolist()
+
+
+def _finite(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def iter_json(result):
+    """Genera el JSON de to_json(result) por tramos, sin listas de Python del tamaño de cada array"""
+    parts = []
+    size = 0
+    for part in _json_parts(result):
+        parts.append(part)
+        size += len(part)
+        if size >= 64 * 1024:
+            yield ''.join(parts)
+            parts, size = [], 0
+    if parts:
+        yield ''.join(parts)
+
+
+def _json_parts(value):
+    if isinstance(value, np.ndarray):
+        if value.ndim != 1:
+            yield json.dumps(_to_list(value), separators=(',', ':'))
+            return
+        yield '['
+        for i in range(0, len(value), STREAM_CHUNK_POINTS):
+            chunk = json.dumps(_to_list(value[i:i + STREAM_CHUNK_POINTS]), separators=(',', ':'))
+            yield (',' if i else '') + chunk[1:-1]
+        yield ']'
+    elif isinstance(value, dict):
+        yield '{'
+        for i, (k, v) in enumerate(value.items()):
+            yield (',' if i else '') + json.dumps(str(k), ensure_ascii=False) + ':'
+            yield from _json_parts(v)
+        yield '}'
+    elif isinstance(value, (list, tuple)):
+        yield '['
+        for i, v in enumerate(value):
+            if i:
+                yield ','
+            yield from _json_parts(v)
+        yield ']'
+    else:
+        yield json.dumps(_finite(value), ensure_ascii=False)
+
+
+def to_binary(result, dtype="float64"):
+    """Codifica el resultado en el formato binario (float64 o float32 little-endian)"""
+    return b''.join(iter_binary(result, dtype))
+
+
+def iter_binary(result, dtype="float64"):
+    """
+    Igual que to_binary pero devuelve un iterador de bytes: el header primero y
+    después cada array convertido por tramos de STREAM_CHUNK_POINTS puntos.
+    """
+    if dtype not in _DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+    dtype = _DTYPES[dtype]
+
+    arrays = []
+    buffers = []
+    offset = 0
+
+    def extract(value):
+        nonlocal offset
+        if isinstance(value, np.ndarray):
+            length = value.size * dtype.itemsize
+            buffers.append({"offset": offset, "length": value.size, "shape": list(value.shape),
+                            "dtype": dtype.name})
+            arrays.append(value)
+            offset += length + -length % 8
+            return {"buffer": len(buffers) - 1}
+        if isinstance(value, dict):
+            return {k: extract(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [extract(v) for v in value]
+        return _finite(value)
+
+    header = extract(result)
+    header["buffers"] = buffers
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    # 4 bytes de largo + header -> múltiplo de 8 para alinear los buffers
+    header_bytes += b' ' * (-(len(header_bytes) + 4) % 8)
+
+    return _binary_chunks(len(header_bytes).to_bytes(4, 'little') + header_bytes, arrays, dtype)
+
+
+def _binary_chunks(header, arrays, dtype):
+    yield header
+    for value in arrays:
+        flat = value.reshape(-1)
+        for i in range(0, len(flat), STREAM_CHUNK_POINTS):
+            yield np.ascontiguousarray(flat[i:i + STREAM_CHUNK_POINTS], dtype=dtype).tobytes()
+        padding = -flat.size * dtype.itemsize % 8
+        if padding:
+            yield b'\0' * padding
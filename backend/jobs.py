@@ -0,0 +1,104 @@
+"""
+Trabajos de simulación asíncronos.
+
+Cada trabajo se ejecuta en segundo plano y guarda su estado, progreso y
+resultado, que se conservan durante un TTL después de terminar. El progreso se
+estima leyendo la salida de ngspice ("Reference value : ..." o porcentajes)
+respecto al rango del análisis del netlist (netlist.analysis_span).
+"""
+import math
+import re
+import threading
+import time
+import uuid
+
+_REFERENCE = re.compile(r'Reference value\s*:\s*([-+]?[\d.]+(?:[eE][-+]?\d+)?)')
+_PERCENT = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+
+
+def parse_progress(text, span=None):
+    """Fracción completada (0..1) según la salida de ngspice, o None si no hay información"""
+    references = _REFERENCE.findall(text)
+    if references and span:
+        start, stop, log_scale = span
+        value = float(references[-1])
+        if log_scale and (start <= 0 or stop <= 0):
+            return None  # Barrido logarítmico inválido (ngspice lo rechazará)
+        if log_scale and value > 0:
+            fraction = math.log(value / start) / math.log(stop / start)
+        else:
+            fraction = (value - start) / (stop - start)
+        return min(max(fraction, 0.0), 1.0)
+
+    percents = _PERCENT.findall(text)
+    if percents:
+        return min(max(float(percents[-1]) / 100, 0.0), 1.0)
+    return None
+
+
+class JobStore:
+    """Registro de trabajos en memoria; los terminados expiran tras `ttl` segundos"""
+
+    def __init__(self, ttl=600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, **info):
+        """Crea un trabajo en estado "queued" y devuelve su dict"""
+        self.purge()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "progress": None,
+            "created": time.time(),
+            "finished": None,
+            "result": None,
+            "error": None,
+            "cancel": threading.Event(),
+            **info,
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+        return job
+
+    def get(self, job_id):
+        """Devuelve el trabajo o None si no existe (o expiró)"""
+        self.purge()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def update(self, job_id, **changes):
+        """Actualiza campos de un trabajo; marca la hora de fin si pasa a un estado final"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(changes)
+            if changes.get("status") in ("done", "error", "cancelled"):
+                job["finished"] = time.time()
+
+    def purge(self):
+        """Elimina los trabajos terminados hace más de `ttl` segundos"""
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job["finished"] is not None and job["finished"] < limit]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+def job_summary(job):
+    """Campos públicos de un trabajo (sin resultado ni evento de cancelación)"""
+    return {k: job[k] for k in ("id", "status", "progress", "created", "finished", "error")}
+
+
+def read_tail(path, size=4096):
+    """Últimos `size` bytes de un archivo de texto ("" si no existe todavía)"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            f.seek(max(f.tell() - size, 0))
+            return f.read().decode('utf-8', errors='replace')
+    except OSError:
+        return ""
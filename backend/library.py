@@ -0,0 +1,257 @@
+"""
+Índice persistente (SQLite) de la biblioteca de circuitos.
+
+Guarda nombre, fecha de modificación, tamaño y metadatos del netlist (título,
+tipos de elementos y análisis) de cada .cir, para que /files pagine y busque
+sin recorrer el directorio. Los guardados del backend actualizan el índice al
+escribir; los cambios hechos desde fuera se detectan por la fecha de
+modificación del directorio y se reconcilian con un re-escaneo.
+
+Con un CircuitStore, el índice es además la capa de alias: cada nombre apunta
+al hash de su contenido en el almacén (columna digest). Los .cir sueltos en el
+directorio (digest NULL) se siguen sirviendo tal cual.
+"""
+import base64
+import os
+import sqlite3
+import threading
+import time
+
+from .netlist import element_types, parse_netlist
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS circuits (
+    name TEXT PRIMARY KEY,
+    modified REAL NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    elements TEXT NOT NULL DEFAULT ',',
+    analyses TEXT NOT NULL DEFAULT ',',
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS circuits_recent ON circuits (modified DESC, name DESC);
+"""
+
+
+def netlist_metadata(content):
+    """Título, tipos de elementos (r, c, q...) y análisis de un netlist"""
+    statements = parse_netlist(content)
+    elements = sorted(element_types(statements))
+    analyses = sorted({s["name"] for s in statements if s["kind"] == "analysis"})
+    return {
+        "title": ' '.join(statements[0]["tokens"]).lstrip('* '),
+        # Separadores en los extremos para buscar con LIKE '%,r,%'
+        "elements": ',' + ','.join(elements) + ',',
+        "analyses": ',' + ','.join(analyses) + ',',
+    }
+
+
+def is_plain_name(name):
+    """True si `name` es un nombre de archivo sin directorios (no sale de la biblioteca)"""
+    return (bool(name) and name not in ('.', '..') and os.path.basename(name) == name
+            and '/' not in name and '\\' not in name)
+
+
+def encode_cursor(modified, name):
+    return base64.urlsafe_b64encode(f"{modified!r}|{name}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """(modified, name) de un cursor de /files; ValueError si no es válido"""
+    try:
+        modified, name = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|', 1)
+        return float(modified), name
+    except (UnicodeError, ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class CircuitIndex:
+    """Índice de los .cir de `directory` en la base SQLite `db_path`"""
+
+    def __init__(self, directory, db_path, store=None):
+        self.directory = directory
+        self.store = store
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(circuits)")}
+        if "digest" not in columns:
+            # Índices creados antes de la capa de alias
+            self._db.execute("ALTER TABLE circuits ADD COLUMN digest TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS circuits_digest ON circuits (digest)")
+        self._dir_mtime = None
+
+    def _read(self, name):
+        """Metadatos de un archivo del directorio; None si no existe"""
+        path = os.path.join(self.directory, name)
+        try:
+            stat = os.stat(path)
+            with open(path, encoding='utf-8', errors='replace') as f:
+                content = f.read()
+        except OSError:
+            return None
+        return {"name": name, "modified": stat.st_mtime, "size": stat.st_size, "digest": None,
+                **netlist_metadata(content)}
+
+    def _upsert(self, rows):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO circuits (name, modified, size, title, elements, analyses, digest) "
+            "VALUES (:name, :modified, :size, :title, :elements, :analyses, :digest)", rows)
+
+    def _directory_mtime(self):
+        try:
+            return os.stat(self.directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def sync(self):
+        """Reconcilia el índice con el directorio (solo relee los archivos nuevos o cambiados)"""
+        with self._lock:
+            dir_mtime = self._directory_mtime()
+            # Solo los archivos sueltos: los alias del almacén no dependen del directorio
+            known = {row["name"]: (row["modified"], row["size"])
+                     for row in self._db.execute(
+                         "SELECT name, modified, size FROM circuits WHERE digest IS NULL")}
+            aliases = {row["name"] for row in self._db.execute(
+                "SELECT name FROM circuits WHERE digest IS NOT NULL")}
+            changed = []
+            present = set()
+            try:
+                entries = list(os.scandir(self.directory))
+            except OSError:
+                entries = []
+            for entry in entries:
+                if not entry.name.endswith('.cir') or not entry.is_file() or entry.name in aliases:
+                    continue
+                present.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) != (stat.st_mtime, stat.st_size):
+                    changed.append(entry.name)
+
+            rows = [row for row in (self._read(name) for name in changed) if row]
+            removed = [(name,) for name in known if name not in present]
+            with self._db:
+                self._upsert(rows)
+                self._db.executemany("DELETE FROM circuits WHERE name = ?", removed)
+            self._dir_mtime = dir_mtime
+            return {"indexed": len(rows), "removed": len(removed), "total": len(present)}
+
+    def refresh(self):
+        """Re-escanea solo si el directorio cambió desde fuera (archivos creados o borrados)"""
+        if self._directory_mtime() != self._dir_mtime:
+            self.sync()
+
+    def record(self, name):
+        """Actualiza el índice tras escribir un archivo (write-through)"""
+        row = self._read(name)
+        with self._lock:
+            with self._db:
+                if row is None:
+                    self._db.execute("DELETE FROM circuits WHERE name = ?", (name,))
+                else:
+                    self._upsert([row])
+            # El cambio del directorio ya está reflejado en el índice
+            self._dir_mtime = self._directory_mtime()
+
+    def _alias(self, name):
+        """Fila del índice de un nombre; None si no existe"""
+        with self._lock:
+            return self._db.execute("SELECT * FROM circuits WHERE name = ?", (name,)).fetchone()
+
+    def save(self, name, content):
+        """
+        Guarda el contenido bajo `name`: en el almacén (alias -> hash) o, sin
+        almacén o si `name` es un archivo suelto existente, en el directorio.
+        """
+        row = self._alias(name)
+        legacy = row is not None and row["digest"] is None
+        if self.store is None or legacy or (row is None and
+                                            os.path.exists(os.path.join(self.directory, name))):
+            with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+            self.record(name)
+            return
+
+        metadata = netlist_metadata(content)
+        # Bajo el lock: un objeto huérfano no se borra mientras otro alias lo reutiliza
+        with self._lock:
+            digest = self.store.put(content)
+            entry = {"name": name, "modified": time.time(), "size": len(content.encode('utf-8')),
+                     "digest": digest, **metadata}
+            with self._db:
+                self._upsert([entry])
+            # El contenido anterior se borra si ya ningún alias lo usa
+            if row is not None and row["digest"] != digest and not self._db.execute(
+                    "SELECT 1 FROM circuits WHERE digest = ? LIMIT 1", (row["digest"],)).fetchone():
+                self.store.delete(row["digest"])
+
+    def read(self, name):
+        """Contenido de un circuito por nombre; None si no existe o no es un nombre válido"""
+        if not is_plain_name(name):
+            return None
+        row = self._alias(name)
+        if row is not None and row["digest"] is not None:
+            return self.store.get(row["digest"]) if self.store else None
+        try:
+            with open(os.path.join(self.directory, name), 'r', encoding='utf-8') as f:
+                return f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            return None
+
+    def names(self):
+        """Nombres de todos los circuitos indexados (más reciente primero)"""
+        with self._lock:
+            return [row["name"] for row in
+                    self._db.execute("SELECT name FROM circuits ORDER BY modified DESC, name DESC")]
+
+    def _path(self, row):
+        if row["digest"] is not None and self.store is not None:
+            return self.store.locate(row["digest"]) or self.store.path(row["digest"])
+        return os.path.join(self.directory, row["name"])
+
+    def list(self, limit=100, cursor=None, offset=0, query=None, element=None, analysis=None):
+        """
+        Archivos del más reciente al más antiguo. Pagina con `cursor` (devuelto
+        como "next_cursor") o con `offset`; filtra por nombre/título (`query`),
+        tipo de elemento (`element`, p. ej. "q") y análisis (`analysis`, p. ej. "tran").
+        """
+        where, params = [], []
+        if cursor:
+            modified, name = decode_cursor(cursor)
+            where.append("(modified < ? OR (modified = ? AND name < ?))")
+            params += [modified, modified, name]
+        if query:
+            pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            where.append("(name LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\')")
+            params += [pattern, pattern]
+        if element:
+            where.append("elements LIKE ?")
+            params.append(f"%,{element.lower()[:1]},%")
+        if analysis:
+            where.append("analyses LIKE ?")
+            params.append(f"%,{analysis.lower().lstrip('.')},%")
+
+        sql = "SELECT * FROM circuits"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY modified DESC, name DESC LIMIT ? OFFSET ?"
+        params += [limit + 1, offset]
+
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+
+        files = [{
+            "name": row["name"],
+            "path": self._path(row),
+            "modified": row["modified"],
+            "size": row["size"],
+            "title": row["title"],
+            "elements": row["elements"].strip(',').split(',') if row["elements"] != ',' else [],
+            "analyses": row["analyses"].strip(',').split(',') if row["analyses"] != ',' else [],
+        } for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(files[-1]["modified"], files[-1]["name"])
+        return {"files": files, "next_cursor": next_cursor}
@@ -0,0 +1,211 @@
+"""
+Métricas Prometheus y tiempos por etapa.
+
+Histogramas y contadores en memoria con exportación en el formato de texto de
+Prometheus (GET /metrics), sin dependencias externas. `stage("ngspice")` mide
+una etapa del camino caliente: la registra en el histograma de etapas y, si la
+petición pidió perfilado (header "X-Profile: 1"), en el desglose que se devuelve
+en el header Server-Timing de la respuesta.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PROFILE_HEADER = "x-profile"
+
+_DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Desglose de la petición en curso ({etapa: [segundos, veces]}); None = sin perfilado
+_profile = contextvars.ContextVar("profile", default=None)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class Counter:
+    """Contador con etiquetas"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma con etiquetas y buckets acumulativos (como prometheus_client)"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=_DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}  # etiquetas -> [cuentas por bucket, suma, total]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _labels(self.labelnames, key, [("le", _number(bound))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_number(total)}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render_metrics():
+    """Todas las métricas en el formato de texto de Prometheus"""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def render_gauges(prefix, stats, documentation):
+    """Valores numéricos de un dict de estadísticas (p. ej. scheduler.stats()) como gauges"""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines += [f"# HELP {name} {documentation} ({key})", f"# TYPE {name} gauge",
+                  f"{name} {_number(value)}"]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds",
+                            "Duración de las peticiones HTTP (hasta terminar de enviar la respuesta)",
+                            ["method", "route", "status"])
+STAGE_SECONDS = Histogram("spice_stage_seconds", "Duración de cada etapa del pipeline", ["stage"])
+
+CHAT_UPSTREAM_SECONDS = Histogram("chat_upstream_latency_seconds",
+                                  "Tiempo hasta la respuesta de OpenRouter (headers)", ["stream"])
+CHAT_FIRST_TOKEN_SECONDS = Histogram("chat_time_to_first_token_seconds",
+                                     "Tiempo desde la petición hasta el primer delta de contenido")
+CHAT_TOKENS_PER_SECOND = Histogram("chat_tokens_per_second",
+                                   "Deltas de contenido por segundo en respuestas en streaming",
+                                   buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+CHAT_DELTAS = Counter("chat_deltas_total", "Deltas de contenido reenviados al cliente")
+
+
+def record_stage(name, seconds):
+    """Registra la duración de una etapa (histograma y perfil de la petición)"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    profile = _profile.get()
+    if profile is not None:
+        entry = profile.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def stage(name):
+    """Mide el bloque como la etapa `name`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def current_profile():
+    """Desglose {etapa: {"ms", "count"}} de la petición en curso (None si no se pidió)"""
+    profile = _profile.get()
+    if profile is None:
+        return None
+    return {name: {"ms": round(seconds * 1000, 3), "count": count}
+            for name, (seconds, count) in list(profile.items())}
+
+
+def server_timing(profile):
+    """Valor del header Server-Timing para un desglose de current_profile()"""
+    return ", ".join(f"{name.replace(' ', '_')};dur={entry['ms']}" for name, entry in profile.items())
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: mide cada petición por ruta y, con "X-Profile: 1", activa el
+    perfilado por etapas y agrega el header Server-Timing a la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profiling = any(name == PROFILE_HEADER.encode() and value not in (b"", b"0")
+                        for name, value in scope.get("headers", []))
+        token = _profile.set({} if profiling else None)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                elapsed = time.perf_counter() - start
+                if profiling:
+                    profile = current_profile()
+                    profile["total"] = {"ms": round(elapsed * 1000, 3), "count": 1}
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"server-timing", server_timing(profile).encode('latin-1'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope["method"],
+                                    route=getattr(route, "path", "unmatched"), status=status["code"])
+            _profile.reset(token)
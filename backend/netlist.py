@@ -0,0 +1,278 @@
+"""
+Parser de netlists SPICE a un AST ligero y pasadas de reescritura sobre él.
+
+El netlist se tokeniza una sola vez en una lista de sentencias (dicts):
+
+    {"kind", "name", "tokens", "lines", "control"}
+
+"kind" es uno de: title, blank, comment, elements, model, analysis, include,
+param, directive, control (.control), endc, command (dentro de .control) y end.
+"lines" conserva el texto original (incluidas las líneas de continuación "+"),
+así que emitir el AST sin cambios reproduce el netlist. Las reescrituras
+(modo batch, forma canónica) recorren el AST en lugar de re-escanear el texto.
+
+Los elementos (R1, C2, X3...) son casi todo el netlist y ninguna reescritura
+los modifica: las líneas consecutivas de elementos forman una sola sentencia
+"elements" (sin "tokens", solo "lines") para no crear un dict por línea.
+"""
+import hashlib
+import re
+
+# Sufijos de escala SPICE (el orden importa: "meg" y "mil" antes que "m")
+_SPICE_SUFFIXES = [('meg', 1e6), ('mil', 25.4e-6), ('t', 1e12), ('g', 1e9), ('k', 1e3),
+                   ('m', 1e-3), ('u', 1e-6), ('n', 1e-9), ('p', 1e-12), ('f', 1e-15)]
+_SPICE_NUMBER = re.compile(r'^([-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)([a-z]*)')
+
+# Análisis (como directiva ".tran" o comando "tran" dentro de .control)
+ANALYSES = frozenset(('ac', 'tran', 'dc', 'op', 'noise', 'tf', 'disto', 'pz', 'sens', 'sp', 'pss'))
+# Análisis que el modo batch saca del bloque .control
+_BATCH_ANALYSES = frozenset(('ac', 'tran', 'dc', 'op'))
+
+_INCLUDES = frozenset(('.include', '.inc', '.lib'))
+
+
+def spice_number(text):
+    """Convierte un número SPICE ("10m", "1.5k", "2meg") a float; None si no es válido"""
+    match = _SPICE_NUMBER.match(text.strip().lower())
+    if not match:
+        return None
+    value = float(match.group(1))
+    for suffix, scale in _SPICE_SUFFIXES:
+        if match.group(2).startswith(suffix):
+            return value * scale
+    return value
+
+
+def _statement(kind, name, tokens, line, control=False):
+    return {"kind": kind, "name": name, "tokens": tokens, "lines": [line], "control": control}
+
+
+def parse_netlist(text):
+    """Tokeniza el netlist (una pasada) y devuelve la lista de sentencias"""
+    lines = text.strip().replace('\r\n', '\n').split('\n')
+    # La primera línea es siempre el título en SPICE
+    statements = [_statement("title", "", lines[0].split(), lines[0])]
+    in_control = False
+    previous = None  # sentencia a la que se unen las líneas "+"
+    block = None  # bloque de elementos abierto (el último de `statements`)
+
+    for line in lines[1:]:
+        head = line[:1]
+        if head == ' ' or head == '\t':
+            head = line.lstrip()[:1]
+
+        if head and head not in '.*+' and not in_control:
+            # Caso más común: un elemento; se agrega al bloque abierto sin tokenizar
+            if block is None or statements[-1] is not block:
+                block = {"kind": "elements", "name": "", "tokens": None, "lines": [], "control": False}
+                statements.append(block)
+            block["lines"].append(line)
+            previous = block
+            continue
+
+        if not head:
+            statements.append(_statement("blank", "", [], line, in_control))
+            continue
+        if head == '*':
+            statements.append(_statement("comment", "", line.split(), line, in_control))
+            continue
+
+        tokens = line.split()
+        first = tokens[0]
+        if head == '+' and previous is not None and not in_control:
+            # Continuación: se une a la sentencia anterior
+            previous["lines"].append(line)
+            if previous["tokens"] is not None:
+                rest = [first[1:]] + tokens[1:] if len(first) > 1 else tokens[1:]
+                previous["tokens"].extend(rest)
+            continue
+
+        name = first.lower()
+        if name.startswith('.control'):
+            in_control = True
+            statement = _statement("control", ".control", tokens, line, True)
+        elif name.startswith('.endc'):
+            in_control = False
+            statement = _statement("endc", ".endc", tokens, line, True)
+        elif in_control:
+            command = name.lstrip('.')
+            kind = "analysis" if command in ANALYSES else "command"
+            statement = _statement(kind, command, tokens, line, True)
+        elif head == '+':
+            # Continuación sin sentencia anterior: se conserva como directiva
+            statement = _statement("directive", name, tokens, line)
+        else:
+            directive = name[1:]
+            if name == '.end':
+                kind = "end"
+            elif directive in ANALYSES:
+                kind = "analysis"
+            elif name == '.model':
+                kind = "model"
+            elif name in _INCLUDES:
+                kind = "include"
+            elif name == '.param':
+                kind = "param"
+            else:
+                kind = "directive"
+            statement = _statement(kind, directive if kind == "analysis" else name, tokens, line)
+
+        statements.append(statement)
+        previous = statement
+
+    return statements
+
+
+def element_types(statements):
+    """Letras de los elementos del netlist (r, c, q...)"""
+    types = set()
+    for statement in statements:
+        if statement["kind"] == "elements":
+            types.update(line.lstrip()[:1].lower() for line in statement["lines"])
+    types.discard('+')
+    return types
+
+
+def render(statements):
+    """Texto del netlist a partir de las sentencias"""
+    lines = []
+    for statement in statements:
+        lines.extend(statement["lines"])
+    return '\n'.join(lines)
+
+
+def _command(text):
+    """Sentencia de control generada por una reescritura"""
+    return _statement("command", text.split()[0].lower(), text.split(), text, True)
+
+
+def rewrite_for_batch(statements, raw):
+    """
+    Prepara el AST para modo batch: los análisis ac/tran/dc/op salen del bloque
+    .control (como directivas), se quitan los plot y cada bloque termina con
+    run y write al rawfile. Sin bloque .control se agrega uno antes de .end.
+    """
+    result = []
+    analyses = []
+    control_index = None
+    has_run = has_write = False
+
+    for statement in statements:
+        kind = statement["kind"]
+        if kind == "control":
+            if control_index is None:
+                control_index = len(result)
+            has_run = has_write = False
+            result.append(statement)
+        elif kind == "endc":
+            # Asegurar que tenemos run y write antes de cerrar
+            if not has_run:
+                result.append(_command('run'))
+            if not has_write:
+                result.append(_command(f'write {raw}'))
+            result.append(statement)
+        elif not statement["control"]:
+            result.append(statement)
+        elif kind == "analysis" and statement["name"] in _BATCH_ANALYSES:
+            # Mover el análisis antes del .control (con punto al inicio)
+            line = statement["lines"][0].strip()
+            line = line if line.startswith('.') else '.' + line
+            analyses.append(_statement("analysis", statement["name"], line.split(), line))
+        elif statement["name"] == 'plot':
+            continue  # plot no funciona en batch
+        elif statement["name"] == 'write':
+            has_write = True
+            result.append(_command(f'write {raw}'))
+        else:
+            if statement["name"].startswith('run'):
+                has_run = True
+            result.append(statement)
+
+    if control_index is not None:
+        result[control_index:control_index] = analyses
+        return result
+
+    # Sin bloque .control: agregarlo antes de .end
+    for i, statement in enumerate(result):
+        if statement["kind"] == "end":
+            block = [_statement("control", ".control", ['.control'], '.control', True),
+                     _command('run'), _command(f'write {raw}'),
+                     _statement("endc", ".endc", ['.endc'], '.endc', True)]
+            result[i:i] = block
+            break
+    return result
+
+
+def rewrite_statements(net, raw):
+    """AST del netlist preparado para modo batch (ver rewrite_for_batch)"""
+    return rewrite_for_batch(parse_netlist(net), raw)
+
+
+def rewrite_netlist(net, raw):
+    """Prepara el netlist para modo batch: análisis fuera de .control, sin plot y con run/write al rawfile"""
+    return render(rewrite_statements(net, raw))
+
+
+def canonical_netlist(statements):
+    """
+    Forma canónica del netlist: sin comentarios ni líneas vacías, continuaciones
+    unidas, espacios colapsados y en minúsculas (salvo el título, las rutas de
+    .include y los comandos de .control, que distinguen mayúsculas).
+    """
+    if isinstance(statements, str):
+        statements = parse_netlist(statements)
+    lines = []
+    for statement in statements:
+        kind = statement["kind"]
+        if kind in ("blank", "comment"):
+            continue
+        if kind == "elements":
+            lines.append(_canonical_elements(statement["lines"]))
+            continue
+        text = ' '.join(statement["tokens"])
+        if kind == "title":
+            lines.append(text)
+        elif kind == "include" or (statement["control"] and kind != "analysis"):
+            lines.append(statement["tokens"][0].lower() + text[len(statement["tokens"][0]):])
+        else:
+            lines.append(text.lower())
+    return '\n'.join(lines)
+
+
+def _canonical_elements(lines):
+    # Todo el bloque de una vez (sin trabajo por línea en Python): "\0" marca los
+    # saltos de línea al colapsar espacios y las continuaciones "+" se unen a su línea
+    words = '\n'.join(lines).lower().replace('\n', ' \0 ').split()
+    text = ' '.join(words).replace(' \0 ', '\n')
+    return text.replace('\n+ ', ' ').replace('\n+', ' ').replace(' \n', '\n').rstrip(' ')
+
+
+def netlist_hash(statements):
+    """Hash SHA-256 de la forma canónica (netlists equivalentes comparten hash)"""
+    return hashlib.sha256(canonical_netlist(statements).encode('utf-8')).hexdigest()
+
+
+def analysis_span(netlist):
+    """
+    Rango barrido por el último análisis del netlist: (inicio, fin, logarítmica)
+    o None si no se puede determinar (p. ej. .op).
+    """
+    statements = parse_netlist(netlist) if isinstance(netlist, str) else netlist
+    span = None
+    for statement in statements:
+        if statement["kind"] != "analysis":
+            continue
+        parts = [token.lower() for token in statement["tokens"]]
+        name = statement["name"]
+        try:
+            if name == 'tran' and len(parts) >= 3:
+                span = (0.0, spice_number(parts[2]), False)
+            elif name == 'ac' and len(parts) >= 5:
+                span = (spice_number(parts[3]), spice_number(parts[4]), parts[1] != 'lin')
+            elif name == 'dc' and len(parts) >= 4:
+                span = (spice_number(parts[2]), spice_number(parts[3]), False)
+        except (TypeError, ValueError):
+            continue
+    if span and None not in span[:2] and span[0] != span[1]:
+        return span
+    return None
@@ -0,0 +1,285 @@
+"""
+Lectura vectorizada de archivos rawfile de ngspice (binarios y ASCII).
+
+El archivo se mapea en memoria, el header se analiza en una sola pasada y los
+datos se decodifican directamente a arrays estructurados de NumPy (un campo por
+variable), sin trabajo en Python por cada punto.
+
+Los datos se recorren en tramos de tamaño fijo (DECODE_CHUNK_BYTES): la memoria
+temporal no crece con el archivo, solo el array de salida. Con `spill_dir` ese
+array es un np.memmap en disco, así que ni siquiera el resultado ocupa RAM
+(el sistema pagina lo que haga falta al codificar la respuesta).
+"""
+import mmap
+import os
+import re
+import tempfile
+
+import numpy as np
+from numpy.lib.recfunctions import repack_fields
+
+# Fin del header: la línea "Binary:" o "Values:" que precede a los datos
+_HEADER_END = re.compile(rb'^(Binary|Values):[ \t]*\r?\n', re.MULTILINE)
+# Inicio del siguiente plot (delimita la sección "Values:" en archivos ASCII)
+_NEXT_PLOT = re.compile(rb'^Title:', re.MULTILINE)
+
+# Bytes del rawfile que se decodifican de una vez
+DECODE_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def _parse_header(text):
+    """Procesa las líneas del header de un plot y devuelve un dict con sus campos"""
+    header = {
+        "title": "",
+        "date": "",
+        "plotname": "",
+        "flags": "",
+        "num_variables": 0,
+        "num_points": 0,
+        "variables": [],
+    }
+    in_variables = False
+
+    for line in text.splitlines():
+        # Las variables van indentadas: "\t<índice>\t<nombre>\t<tipo> [opciones]"
+        if in_variables and line[:1] in (' ', '\t'):
+            parts = line.split()
+            if len(parts) >= 3 and parts[0].isdigit():
+                header["variables"].append({
+                    'index': int(parts[0]),
+                    'name': parts[1],
+                    'type': parts[2]
+                })
+            continue
+
+        key, _, value = line.partition(':')
+        key = key.strip()
+        value = value.strip()
+        in_variables = False
+
+        if key == 'Title':
+            header["title"] = value
+        elif key == 'Date':
+            header["date"] = value
+        elif key == 'Plotname':
+            header["plotname"] = value
+        elif key == 'Flags':
+            header["flags"] = value.lower()
+        elif key == 'No. Variables':
+            header["num_variables"] = int(value)
+        elif key == 'No. Points':
+            header["num_points"] = int(value)
+        elif key == 'Variables':
+            in_variables = True
+
+    return header
+
+
+def _field_names(variables):
+    """Nombres de campo para el tipo estructurado (NumPy exige nombres únicos)"""
+    names = []
+    for var in variables:
+        name = var['name']
+        if name in names:
+            name = f"{name}#{var['index']}"
+        names.append(name)
+    return names
+
+
+def select_variables(variables, vectors):
+    """
+    Posiciones de las variables pedidas en `vectors` (sin distinguir mayúsculas;
+    "out" también coincide con "v(out)"). La escala (variable 0) siempre se incluye.
+    """
+    if vectors is None:
+        return list(range(len(variables)))
+
+    wanted = set()
+    for name in vectors:
+        name = name.strip().lower()
+        wanted.add(name)
+        wanted.add(f"v({name})")
+
+    return [i for i, var in enumerate(variables)
+            if i == 0 or var['name'].lower() in wanted]
+
+
+def _allocate(dtype, count, spill_dir=None):
+    """Array de salida: en memoria o, con `spill_dir`, un np.memmap en un archivo de ese directorio"""
+    if spill_dir is None or count == 0:
+        return np.empty(count, dtype=dtype)
+    fd, path = tempfile.mkstemp(dir=spill_dir, suffix='.bin')
+    os.close(fd)
+    return np.memmap(path, dtype=dtype, mode='w+', shape=(count,))
+
+
+def _decode_binary(buf, start, header, selected, spill_dir=None):
+    """Decodifica los datos binarios de un plot; devuelve (array, offset del siguiente plot)"""
+    base = np.complex128 if 'complex' in header["flags"] else np.float64
+    names = _field_names(header["variables"])
+    itemsize = np.dtype(base).itemsize
+    point_size = itemsize * len(names)
+
+    # Solo se leen los campos seleccionados (los demás quedan como relleno)
+    dtype = np.dtype({
+        "names": [names[i] for i in selected],
+        "formats": [base] * len(selected),
+        "offsets": [i * itemsize for i in selected],
+        "itemsize": point_size,
+    })
+
+    available = (len(buf) - start) // point_size
+    count = min(header["num_points"], available)
+    data = np.frombuffer(buf, dtype=dtype, count=count, offset=start)
+    end = start + header["num_points"] * point_size
+    # Copia compacta fuera del mmap para poder cerrarlo
+    if spill_dir is None:
+        return data.astype(repack_fields(dtype)), end
+
+    # Al disco tramo a tramo: solo un tramo del archivo en memoria a la vez
+    out = _allocate(repack_fields(dtype), count, spill_dir)
+    step = max(DECODE_CHUNK_BYTES // point_size, 1)
+    for i in range(0, count, step):
+        out[i:i + step] = data[i:i + step]
+    return out, end
+
+
+def _decode_ascii(buf, start, end, header, selected, spill_dir=None):
+    """Decodifica la sección "Values:" de un plot ASCII, vectorizado por tramos"""
+    is_complex = 'complex' in header["flags"]
+    names = _field_names(header["variables"])
+    # Cada punto: índice + un valor por variable ("re,im" si es complejo)
+    per_value = 2 if is_complex else 1
+    width = 1 + len(names) * per_value
+    # Columnas de cada punto que se conservan (sin el índice)
+    columns = np.array([1 + i * per_value + k for i in selected for k in range(per_value)])
+
+    dtype = np.dtype({
+        "names": [names[i] for i in selected],
+        "formats": [np.complex128 if is_complex else np.float64] * len(selected),
+    })
+    out = _allocate(dtype, header["num_points"], spill_dir)
+    # Filas contiguas de float64 vistas sobre el tipo estructurado
+    table = out.view(np.float64).reshape(len(out), len(columns))
+
+    count = 0
+    carry = np.empty(0)  # valores de un punto incompleto al final del tramo anterior
+    pos = start
+    while pos < end and count < len(out):
+        stop = min(pos + DECODE_CHUNK_BYTES, end)
+        if stop < end:
+            # Cortar en un salto de línea para no partir un número
+            cut = buf.rfind(b'\n', pos, stop)
+            if cut < 0:
+                cut = buf.find(b'\n', stop, end)
+            stop = end if cut < 0 else cut + 1
+
+        flat = np.array(buf[pos:stop].replace(b',', b' ').split(), dtype=np.float64)
+        if carry.size:
+            flat = np.concatenate((carry, flat))
+        rows = min(flat.size // width, len(out) - count)
+        table[count:count + rows] = flat[:rows * width].reshape(rows, width)[:, columns]
+        carry = flat[rows * width:]
+        count += rows
+        pos = stop
+
+    return out[:count]
+
+
+def read_rawfile(path, vectors=None, spill_dir=None):
+    """
+    Lee todos los plots de un rawfile de ngspice.
+    Devuelve una lista de dicts con los campos del header y "data" (array
+    estructurado con un campo por variable). Si se pasa `vectors`, solo se
+    decodifican esas variables (más la escala de cada plot). Con `spill_dir`,
+    "data" es un np.memmap en ese directorio (el llamador lo elimina al terminar).
+    """
+    with open(path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Archivo vacío: no se puede mapear
+            return []
+
+    plots = []
+    try:
+        pos = 0
+        while pos < len(buf):
+            match = _HEADER_END.search(buf, pos)
+            if not match:
+                break
+
+            header = _parse_header(buf[pos:match.start()].decode('ascii', errors='ignore'))
+            is_binary = match.group(1) == b'Binary'
+
+            if not header["variables"]:
+                # Plot sin variables: saltar hasta el siguiente header
+                next_plot = _NEXT_PLOT.search(buf, match.end())
+                pos = next_plot.start() if next_plot else len(buf)
+                continue
+
+            selected = select_variables(header["variables"], vectors)
+
+            if is_binary:
+                data, end = _decode_binary(buf, match.end(), header, selected, spill_dir)
+            else:
+                next_plot = _NEXT_PLOT.search(buf, match.end())
+                end = next_plot.start() if next_plot else len(buf)
+                data = _decode_ascii(buf, match.end(), end, header, selected, spill_dir)
+
+            header["variables"] = [header["variables"][i] for i in selected]
+            header["binary"] = is_binary
+            header["data"] = data
+            plots.append(header)
+
+            pos = end
+    finally:
+        buf.close()
+
+    return plots
+
+
+def make_plot(title, plotname, variables, columns):
+    """
+    Arma un plot con el mismo formato que read_rawfile a partir de vectores en
+    memoria (p. ej. leídos de libngspice). `columns` son arrays 1-D alineados
+    con `variables`; la escala debe ser la primera.
+    """
+    is_complex = any(np.iscomplexobj(column) for column in columns)
+    names = _field_names(variables)
+    count = min((len(column) for column in columns), default=0)
+    data = np.empty(count, dtype=np.dtype({
+        "names": names,
+        "formats": [np.complex128 if is_complex else np.float64] * len(names),
+    }))
+    for name, column in zip(names, columns):
+        data[name] = column[:count]
+
+    return {
+        "title": title,
+        "date": "",
+        "plotname": plotname,
+        "flags": "complex" if is_complex else "real",
+        "num_variables": len(variables),
+        "num_points": count,
+        "variables": variables,
+        "binary": True,
+        "data": data,
+    }
+
+
+def magnitude(values):
+    """Magnitud de un vector (valor absoluto si es complejo, sin cambios si es real)"""
+    return np.abs(values) if np.iscomplexobj(values) else values
+
+
+def to_db(values):
+    """Convierte magnitudes positivas a dB; los valores <= 0 se dejan sin cambios"""
+    values = magnitude(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(values > 0, 20 * np.log10(values), values)
+
+
+def phase(values, degrees=True):
+    """Fase de un vector complejo (grados por defecto)"""
+    return np.angle(values, deg=degrees)
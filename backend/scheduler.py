@@ -0,0 +1,178 @@
+"""
+Planificador de ejecuciones de ngspice.
+
+Limita cuántos procesos ngspice corren a la vez (por defecto, uno por núcleo),
+mantiene una cola de admisión acotada y aplica a cada trabajo un límite de
+tiempo y de memoria. Los trabajos pueden cancelarse (p. ej. si el cliente se
+desconecta) y se matan junto con su grupo de procesos.
+"""
+import os
+import signal
+import subprocess
+import threading
+import time
+
+try:
+    import resource  # Solo POSIX (prlimit: Linux): límite de memoria por proceso
+except ImportError:
+    resource = None
+
+
+class QueueFullError(Exception):
+    """La cola de simulaciones está llena; el cliente debe reintentar más tarde"""
+
+
+class SimulationScheduler:
+    """Ejecuta comandos con concurrencia acotada, cola limitada, timeout y límite de memoria"""
+
+    def __init__(self, workers=None, queue_size=None, timeout=60, memory_mb=2048):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 4 if queue_size is None else queue_size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._pending = 0  # en cola + en ejecución
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def is_full(self):
+        """True si un nuevo trabajo sería rechazado"""
+        with self._lock:
+            return self._pending >= self.workers + self.queue_size
+
+    def run(self, args, cancel=None, on_tick=None, stderr_path=None):
+        """
+        Ejecuta `args` cuando haya un worker libre.
+        Devuelve {"status": "ok"|"timeout"|"cancelled", "returncode", "stdout", "stderr"}.
+        Lanza QueueFullError si la cola está llena.
+        `on_tick` se llama periódicamente mientras el proceso corre; con `stderr_path`
+        la salida de error va a ese archivo para poder leerla durante la ejecución.
+        """
+        return self.call(lambda: self._execute(args, cancel, on_tick, stderr_path), cancel)
+
+    def call(self, fn, cancel=None):
+        """
+        Ejecuta fn() con las mismas reglas de admisión y concurrencia que run()
+        (para motores que no lanzan un proceso por trabajo). `fn` debe devolver
+        un dict con el mismo formato que run().
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise QueueFullError(
+                    f"Simulation queue is full ({self.queue_size} jobs waiting); try again later")
+            self._pending += 1
+
+        try:
+            # Esperar un worker libre sin dejar de atender la cancelación
+            while not self._slots.acquire(timeout=0.1):
+                if cancel is not None and cancel.is_set():
+                    with self._lock:
+                        self.cancelled += 1
+                    return {"status": "cancelled", "returncode": None, "stdout": "", "stderr": ""}
+
+            with self._lock:
+                self._running += 1
+            try:
+                job = fn()
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+        with self._lock:
+            if job["status"] == "timeout":
+                self.timeouts += 1
+            elif job["status"] == "cancelled":
+                self.cancelled += 1
+            else:
+                self.completed += 1
+        return job
+
+    def _limit_memory(self, pid):
+        # Desde el padre con prlimit: preexec_fn no es seguro con hilos (el hijo
+        # puede bloquearse antes de exec), y el servidor tiene varios pools de hilos
+        limit = self.memory_mb * 1024 * 1024
+        try:
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+        except (ProcessLookupError, PermissionError, OSError):
+            pass  # El proceso ya terminó
+
+    def _execute(self, args, cancel, on_tick, stderr_path):
+        use_limit = resource is not None and hasattr(resource, "prlimit") and self.memory_mb
+        stderr_file = open(stderr_path, 'w') if stderr_path else None
+        try:
+            proc = subprocess.Popen(
+                args,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file or subprocess.PIPE,
+                text=True,
+                start_new_session=True,  # grupo propio para matar también a los hijos
+            )
+        finally:
+            if stderr_file:
+                stderr_file.close()
+        if use_limit:
+            self._limit_memory(proc.pid)
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        status = "ok"
+
+        try:
+            while True:
+                try:
+                    stdout, stderr = proc.communicate(timeout=0.1)
+                    break
+                except subprocess.TimeoutExpired:
+                    if on_tick is not None:
+                        on_tick()
+                    if cancel is not None and cancel.is_set():
+                        status = "cancelled"
+                    elif deadline is not None and time.monotonic() > deadline:
+                        status = "timeout"
+                    else:
+                        continue
+
+                    self._kill(proc)
+                    stdout, stderr = proc.communicate()
+                    break
+        finally:
+            # Si on_tick (u otra cosa) falla, no dejar ngspice corriendo sin límite de tiempo
+            if proc.returncode is None:
+                self._kill(proc)
+                proc.communicate()
+
+        if stderr_path:
+            with open(stderr_path, errors='replace') as f:
+                stderr = f.read()
+
+        return {"status": status, "returncode": proc.returncode, "stdout": stdout, "stderr": stderr}
+
+    @staticmethod
+    def _kill(proc):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            proc.kill()
+
+    def stats(self):
+        """Estado de la cola y contadores de trabajos"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "cancelled": self.cancelled,
+                "timeout_s": self.timeout,
+                "memory_mb": self.memory_mb,
+            }
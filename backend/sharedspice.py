@@ -0,0 +1,353 @@
+"""
+Motor ngspice en memoria mediante libngspice (API "shared").
+
+Cada proceso worker del grupo mantiene una instancia de libngspice ya
+inicializada (spinit y code models se cargan una sola vez). Los circuitos se
+cargan con ngSpice_Circ y los vectores se leen directamente de memoria, sin
+archivos temporales ni rawfile. Si un trabajo excede el tiempo, se cancela o
+el worker muere, se mata y se reemplaza por uno nuevo.
+"""
+import ctypes
+import ctypes.util
+import multiprocessing
+import os
+import queue
+import re
+import time
+
+import numpy as np
+
+from .rawfile import make_plot, select_variables
+
+try:
+    import resource  # Solo POSIX: límite de memoria por proceso
+except ImportError:
+    resource = None
+
+# enum simulation_types de ngspice (los demás se reportan como "notype")
+_VECTOR_TYPES = {1: 'time', 2: 'frequency', 3: 'voltage', 4: 'current'}
+_VF_COMPLEX = 2
+
+# Nombre completo de cada tipo de plot ("tran1" -> "Transient Analysis")
+_PLOT_NAMES = {
+    'tran': 'Transient Analysis',
+    'ac': 'AC Analysis',
+    'dc': 'DC transfer characteristic',
+    'op': 'Operating Point',
+    'noise': 'Noise Spectral Density Curves',
+    'tf': 'Transfer Function',
+    'sens': 'Sensitivity Analysis',
+    'pz': 'Pole-Zero Analysis',
+    'disto': 'Distortion Analysis',
+    'sp': 'S-Parameter Analysis',
+}
+
+
+class _NgComplex(ctypes.Structure):
+    _fields_ = [("real", ctypes.c_double), ("imag", ctypes.c_double)]
+
+
+class _VectorInfo(ctypes.Structure):
+    _fields_ = [
+        ("name", ctypes.c_char_p),
+        ("type", ctypes.c_int),
+        ("flags", ctypes.c_short),
+        ("realdata", ctypes.POINTER(ctypes.c_double)),
+        ("compdata", ctypes.POINTER(_NgComplex)),
+        ("length", ctypes.c_int),
+    ]
+
+
+_SendChar = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p)
+_SendStat = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_void_p)
+_ControlledExit = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_bool, ctypes.c_bool,
+                                   ctypes.c_int, ctypes.c_void_p)
+
+
+def find_library():
+    """Ruta de libngspice (NGSPICE_LIBRARY o búsqueda del sistema); None si no está"""
+    return os.getenv("NGSPICE_LIBRARY") or ctypes.util.find_library("ngspice")
+
+
+class _Engine:
+    """Instancia de libngspice dentro de un proceso worker"""
+
+    def __init__(self, library):
+        self.lib = ctypes.CDLL(library)
+        self.output = []
+        self.exited = False
+        # Guardar los callbacks: si el GC los libera, ngspice llamaría a memoria inválida
+        self._callbacks = (_SendChar(self._on_char), _SendStat(self._on_stat),
+                           _ControlledExit(self._on_exit))
+
+        lib = self.lib
+        lib.ngSpice_Init.argtypes = [_SendChar, _SendStat, _ControlledExit,
+                                     ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p,
+                                     ctypes.c_void_p]
+        lib.ngSpice_Circ.argtypes = [ctypes.POINTER(ctypes.c_char_p)]
+        lib.ngSpice_Command.argtypes = [ctypes.c_char_p]
+        lib.ngSpice_AllPlots.restype = ctypes.POINTER(ctypes.c_char_p)
+        lib.ngSpice_AllVecs.argtypes = [ctypes.c_char_p]
+        lib.ngSpice_AllVecs.restype = ctypes.POINTER(ctypes.c_char_p)
+        lib.ngGet_Vec_Info.argtypes = [ctypes.c_char_p]
+        lib.ngGet_Vec_Info.restype = ctypes.POINTER(_VectorInfo)
+
+        lib.ngSpice_Init(*self._callbacks, None, None, None, None)
+
+    def _on_char(self, text, ident, user):
+        line = text.decode('utf-8', errors='replace')
+        # ngspice antepone "stdout " o "stderr " a cada línea
+        if line.startswith(('stdout ', 'stderr ')):
+            line = line[7:]
+        self.output.append(line)
+        return 0
+
+    def _on_stat(self, text, ident, user):
+        return 0
+
+    def _on_exit(self, status, unload, quit, ident, user):
+        # ngspice pidió terminar: este worker ya no debe reutilizarse
+        self.exited = True
+        return 0
+
+    @staticmethod
+    def _strings(pointer):
+        """Convierte un char** terminado en NULL a una lista de str"""
+        names = []
+        if pointer:
+            i = 0
+            while pointer[i]:
+                names.append(pointer[i].decode('utf-8', errors='replace'))
+                i += 1
+        return names
+
+    @staticmethod
+    def _vector_data(info):
+        """Copia los datos de un vector a un array de NumPy"""
+        if info.length <= 0:
+            return np.empty(0)
+        if info.flags & _VF_COMPLEX and info.compdata:
+            pairs = ctypes.cast(info.compdata, ctypes.POINTER(ctypes.c_double))
+            return np.ctypeslib.as_array(pairs, shape=(info.length * 2,)).view(np.complex128).copy()
+        return np.ctypeslib.as_array(info.realdata, shape=(info.length,)).copy()
+
+    def simulate(self, lines, vectors=None, title=""):
+        """Carga el circuito (su bloque .control ejecuta run) y devuelve (código, plots)"""
+        self.output = []
+        circuit = (ctypes.c_char_p * (len(lines) + 1))(
+            *[line.encode('utf-8') for line in lines], None)
+        returncode = self.lib.ngSpice_Circ(circuit)
+
+        try:
+            plots = self._read_plots(vectors, title)
+        finally:
+            # Liberar vectores y circuito para el siguiente trabajo
+            self.lib.ngSpice_Command(b"destroy all")
+            self.lib.ngSpice_Command(b"remcirc")
+        return returncode, plots
+
+    def _read_plots(self, vectors, title):
+        plots = []
+        # ngspice lista primero el plot más reciente
+        for plot_name in reversed(self._strings(self.lib.ngSpice_AllPlots())):
+            if plot_name == 'const':
+                continue
+
+            infos = []
+            for vec_name in self._strings(self.lib.ngSpice_AllVecs(plot_name.encode('utf-8'))):
+                info = self.lib.ngGet_Vec_Info(f"{plot_name}.{vec_name}".encode('utf-8'))
+                if info:
+                    infos.append((vec_name, info.contents))
+            if not infos:
+                continue
+
+            # La escala (tiempo, frecuencia o barrido) va primero, como en el rawfile
+            scale = next((i for i, (name, info) in enumerate(infos)
+                          if info.type in (1, 2) or name.endswith('sweep')), 0)
+            infos.insert(0, infos.pop(scale))
+
+            variables = [{'index': i, 'name': name if i == 0 else _rawfile_name(name, info.type),
+                          'type': _VECTOR_TYPES.get(info.type, 'notype')}
+                         for i, (name, info) in enumerate(infos)]
+            selected = select_variables(variables, vectors)
+
+            kind = re.match(r'[a-z]*', plot_name).group(0)
+            plots.append(make_plot(
+                title,
+                _PLOT_NAMES.get(kind, plot_name),
+                [variables[i] for i in selected],
+                [self._vector_data(infos[i][1]) for i in selected],
+            ))
+        return plots
+
+
+def _rawfile_name(name, vector_type):
+    """Nombre del vector como en el rawfile ("out" -> "v(out)", "v1#branch" -> "i(v1)")"""
+    if name.lower().endswith('#branch'):
+        return f"i({name[:-len('#branch')]})"
+    if vector_type == 3 and '(' not in name:
+        return f"v({name})"
+    return name
+
+
+def _worker_main(conn, library, memory_mb):
+    """Bucle de un proceso worker: inicializa libngspice una vez y atiende trabajos"""
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    try:
+        engine = _Engine(library)
+    except (OSError, AttributeError) as e:
+        conn.send({"status": "error", "error": str(e)})
+        return
+    conn.send({"status": "ready"})
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        lines, vectors, title = job
+        try:
+            returncode, plots = engine.simulate(lines, vectors, title)
+        except Exception as e:
+            engine.output.append(f"Error reading ngspice vectors: {e}")
+            returncode, plots = 1, []
+
+        conn.send({"status": "ok", "returncode": returncode, "stdout": '\n'.join(engine.output),
+                   "stderr": "", "plots": plots, "exited": engine.exited})
+        if engine.exited:
+            return
+
+
+class SharedSpicePool:
+    """Grupo de procesos con libngspice cargada; run() tiene el formato de SimulationScheduler.run()"""
+
+    def __init__(self, size, timeout=60, memory_mb=2048, library=None):
+        self.library = library or find_library()
+        if not self.library:
+            raise OSError("libngspice not found (set NGSPICE_LIBRARY)")
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        # spawn: no heredar hilos ni estado del servidor en los workers
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        """Lanza un worker y espera a que libngspice esté inicializada"""
+        parent, child = self._context.Pipe()
+        proc = self._context.Process(target=_worker_main,
+                                     args=(child, self.library, self.memory_mb), daemon=True)
+        proc.start()
+        child.close()
+
+        if not parent.poll(30):
+            proc.kill()
+            raise OSError("libngspice worker did not start")
+        try:
+            message = parent.recv()
+        except EOFError:
+            message = {"status": "error", "error": "libngspice worker exited during startup"}
+        if message["status"] != "ready":
+            proc.join()
+            raise OSError(message.get("error", "libngspice worker failed"))
+        return proc, parent
+
+    def run(self, lines, cancel=None, vectors=None, title=""):
+        """
+        Simula el circuito (lista de líneas) en un worker libre.
+        Devuelve {"status", "returncode", "stdout", "stderr", "plots"}.
+        """
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        slot = self._acquire(cancel, deadline)
+        if not isinstance(slot, tuple):
+            # Sin worker: cancelado, sin turno antes del timeout o no se pudo lanzar
+            return slot
+
+        proc, conn = slot
+        try:
+            conn.send((lines, vectors, title))
+            status = "ok"
+
+            while not conn.poll(0.1):
+                if not proc.is_alive():
+                    break
+                if cancel is not None and cancel.is_set():
+                    status = "cancelled"
+                elif deadline is not None and time.monotonic() > deadline:
+                    status = "timeout"
+                else:
+                    continue
+                break
+
+            if status == "ok":
+                try:
+                    result = conn.recv()
+                except EOFError:
+                    status = "crashed"
+                else:
+                    if result.pop("exited", False):
+                        # ngspice pidió salir (quit/exit): el worker termina tras responder
+                        proc.join(timeout=5)
+                        if proc.is_alive():
+                            proc.kill()
+                            proc.join()
+                    return result
+
+            # Worker colgado, cancelado o muerto: se descarta (se relanza al volver a usarse)
+            proc.kill()
+            proc.join()
+            if status == "crashed":
+                return {"status": "ok", "returncode": 1, "plots": [], "stderr": "",
+                        "stdout": "ngspice worker crashed during the simulation"}
+            return {"status": status, "returncode": None, "stdout": "", "stderr": "", "plots": []}
+        finally:
+            # Siempre se devuelve el lugar al grupo; None = worker a relanzar
+            if proc.is_alive():
+                self._idle.put((proc, conn))
+            else:
+                proc.join()
+                self._idle.put(None)
+
+    def _acquire(self, cancel, deadline):
+        """Worker libre (proc, conn), o el resultado a devolver si no se consiguió uno"""
+        while True:
+            try:
+                slot = self._idle.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if cancel is not None and cancel.is_set():
+                    status = "cancelled"
+                elif deadline is not None and time.monotonic() > deadline:
+                    status = "timeout"
+                else:
+                    continue
+                return {"status": status, "returncode": None, "stdout": "", "stderr": "", "plots": []}
+
+        if slot is not None:
+            return slot
+        try:
+            return self._spawn()
+        except OSError as e:
+            self._idle.put(None)
+            return {"status": "ok", "returncode": 1, "plots": [], "stderr": "",
+                    "stdout": f"Could not start a libngspice worker: {e}"}
+
+    def close(self):
+        """Detiene todos los workers"""
+        while not self._idle.empty():
+            slot = self._idle.get()
+            if slot is None:
+                continue
+            proc, conn = slot
+            try:
+                conn.send(None)
+            except (OSError, BrokenPipeError):
+                pass
+            proc.join(timeout=5)
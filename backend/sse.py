@@ -0,0 +1,87 @@
+"""
+Decodificador incremental de Server-Sent Events.
+
+Recibe los bytes tal como llegan de la red y devuelve eventos completos. Las
+líneas se separan sobre bytes (un "\\n" nunca cae dentro de una secuencia UTF-8
+multibyte, así que los caracteres partidos entre chunks se completan solos) y
+se decodifican desde un memoryview, sin copiar el resto del buffer por línea:
+el costo es lineal en el tamaño del stream.
+"""
+
+
+def format_event(data):
+    """Codifica un evento SSE con un único campo data (data ya serializado)"""
+    return b'data: ' + data.encode('utf-8') + b'\n\n'
+
+
+class SSEDecoder:
+    """Parser SSE incremental: feed(bytes) -> lista de eventos {"event", "data", "id"}"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._data = []
+        self._event = None
+        self._id = None
+
+    def feed(self, chunk):
+        """Agrega bytes y devuelve los eventos completados por ellos"""
+        self._buffer += chunk
+        events = []
+        view = memoryview(self._buffer)
+        start = 0
+        try:
+            while True:
+                end = self._buffer.find(b'\n', start)
+                if end == -1:
+                    break
+                # CRLF: descartar el "\r" final
+                stop = end - 1 if end > start and self._buffer[end - 1] == 0x0D else end
+                event = self._line(str(view[start:stop], 'utf-8', 'replace'))
+                if event is not None:
+                    events.append(event)
+                start = end + 1
+        finally:
+            view.release()
+        # Un solo corte por chunk: solo queda la línea incompleta
+        if start:
+            del self._buffer[:start]
+        return events
+
+    def flush(self):
+        """Fin del stream: procesa la última línea y el evento pendiente, si los hay"""
+        events = []
+        if self._buffer:
+            event = self._line(self._buffer.decode('utf-8', 'replace').rstrip('\r'))
+            self._buffer.clear()
+            if event is not None:
+                events.append(event)
+        event = self._line('')
+        if event is not None:
+            events.append(event)
+        return events
+
+    def _line(self, line):
+        """Procesa una línea; devuelve el evento si la línea vacía lo despacha"""
+        if not line:
+            if not self._data:
+                self._event = None
+                return None
+            event = {"event": self._event or "message", "data": '\n'.join(self._data),
+                     "id": self._id}
+            self._data = []
+            self._event = None
+            return event
+
+        if line[0] == ':':
+            return None  # Comentario (keep-alive de OpenRouter)
+
+        field, sep, value = line.partition(':')
+        if sep and value[:1] == ' ':
+            value = value[1:]
+        if field == 'data':
+            self._data.append(value)
+        elif field == 'event':
+            self._event = value
+        elif field == 'id':
+            self._id = value
+        return None
@@ -0,0 +1,103 @@
+"""
+Almacenamiento de circuitos direccionado por contenido.
+
+Cada netlist se guarda una sola vez bajo el SHA-256 de su contenido, en
+subdirectorios por prefijo del hash (objects/ab/abcd....cir) para que ningún
+directorio crezca sin límite. Las escrituras son atómicas (archivo temporal +
+rename), así que dos streams que guardan a la vez nunca se pisan, y un
+contenido idéntico no se vuelve a escribir. Los objetos que no se escriben
+hace tiempo pueden comprimirse con gzip (.cir.gz); la lectura es transparente.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+
+
+def content_digest(content):
+    """SHA-256 (hex) del contenido de un netlist"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class CircuitStore:
+    """Objetos inmutables en `root`/ab/<sha256>.cir (o .cir.gz si están comprimidos)"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest, compressed=False):
+        return os.path.join(self.root, digest[:2], digest + ('.cir.gz' if compressed else '.cir'))
+
+    def locate(self, digest):
+        """Ruta del objeto (comprimido o no); None si no existe"""
+        for compressed in (False, True):
+            path = self.path(digest, compressed)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, content):
+        """Guarda el contenido (si no existe ya) y devuelve su hash"""
+        digest = content_digest(content)
+        for compressed in (False, True):
+            try:
+                # Deduplicado: solo se marca como escrito recientemente
+                os.utime(self.path(digest, compressed))
+                return digest
+            except FileNotFoundError:
+                continue
+
+        self._write(self.path(digest), content.encode('utf-8'))
+        return digest
+
+    def get(self, digest):
+        """Contenido del objeto; None si no existe"""
+        # Sin comprimir primero: la compresión escribe el .gz antes de borrar el .cir
+        for compressed in (False, True):
+            try:
+                with (gzip.open if compressed else open)(self.path(digest, compressed), 'rb') as f:
+                    return f.read().decode('utf-8')
+            except FileNotFoundError:
+                continue
+        return None
+
+    def delete(self, digest):
+        """Elimina el objeto (ya no lo referencia ningún alias)"""
+        for compressed in (False, True):
+            try:
+                os.remove(self.path(digest, compressed))
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _write(path, data):
+        # Escritura atómica: archivo temporal en el mismo directorio + rename
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def compress_cold(self, max_age):
+        """Comprime con gzip los objetos sin escribir en los últimos `max_age` segundos"""
+        limit = time.time() - max_age
+        compressed = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith('.cir') or entry.stat().st_mtime >= limit:
+                    continue
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+                digest = entry.name[:-len('.cir')]
+                self._write(self.path(digest, compressed=True), gzip.compress(data))
+                os.remove(entry.path)
+                compressed += 1
+        return compressed
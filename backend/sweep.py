@@ -0,0 +1,225 @@
+"""
+Barridos de parámetros y Monte Carlo sobre un netlist base.
+
+Expande rejillas de valores (o muestras aleatorias alrededor del valor nominal)
+en puntos de simulación, sustituye los valores en el netlist y apila los
+resultados de todos los puntos en un array por vector con sus estadísticas.
+"""
+import itertools
+import re
+
+import numpy as np
+
+from .netlist import spice_number
+
+# Elementos cuyo valor se puede barrer (R1, C2, L3, V1, I1)
+_SWEEPABLE = ('r', 'c', 'l', 'v', 'i')
+
+
+def _grid_values(name, spec):
+    """Valores de un parámetro: {"values": [...]} o {"start", "stop", "points", "scale"}"""
+    if isinstance(spec, list):
+        spec = {"values": spec}
+
+    if "values" in spec:
+        values = [spice_number(str(v)) for v in spec["values"]]
+    elif "start" in spec and "stop" in spec:
+        start = spice_number(str(spec["start"]))
+        stop = spice_number(str(spec["stop"]))
+        points = int(spec.get("points", 10))
+        if None in (start, stop) or points < 1:
+            raise ValueError(f"Invalid range for parameter {name}")
+        if spec.get("scale", "lin") == "log":
+            if start <= 0 or stop <= 0:
+                raise ValueError(f"Log sweep of {name} needs positive start and stop")
+            values = np.geomspace(start, stop, points).tolist()
+        else:
+            values = np.linspace(start, stop, points).tolist()
+    else:
+        raise ValueError(f"Parameter {name} needs \"values\" or \"start\"/\"stop\"")
+
+    if not values or None in values:
+        raise ValueError(f"Invalid values for parameter {name}")
+    return values
+
+
+def _sample_values(name, spec, nominal, samples, rng):
+    """Muestras Monte Carlo: {"tolerance": 0.05, "distribution": "gaussian"|"uniform"}"""
+    if nominal is None:
+        raise ValueError(f"Nominal value of {name} not found in the netlist")
+    tolerance = float(spec.get("tolerance", 0.05))
+    distribution = spec.get("distribution", "gaussian")
+
+    if distribution == "uniform":
+        deviation = rng.uniform(-tolerance, tolerance, samples)
+    elif distribution == "gaussian":
+        # La tolerancia corresponde a 3 sigma
+        deviation = rng.normal(0.0, tolerance / 3, samples)
+    else:
+        raise ValueError(f"Unknown distribution for {name}: {distribution}")
+    return (nominal * (1 + deviation)).tolist()
+
+
+def expand_points(netlist, parameters, mode="grid", samples=100, seed=None, max_points=None):
+    """
+    Lista de puntos ({parámetro: valor}) a simular.
+    "grid": producto cartesiano de los valores de cada parámetro.
+    "montecarlo": `samples` puntos con todos los parámetros variando a la vez.
+    """
+    if not parameters:
+        raise ValueError("No parameters to sweep")
+    names = list(parameters)
+
+    if mode == "grid":
+        grids = [_grid_values(name, parameters[name]) for name in names]
+        count = int(np.prod([len(g) for g in grids]))
+        if max_points and count > max_points:
+            raise ValueError(f"Sweep has {count} points (limit {max_points})")
+        return [dict(zip(names, combo)) for combo in itertools.product(*grids)]
+
+    if mode == "montecarlo":
+        samples = int(samples)
+        if samples < 1 or (max_points and samples > max_points):
+            raise ValueError(f"Monte Carlo samples must be between 1 and {max_points}")
+        rng = np.random.default_rng(seed)
+        columns = [_sample_values(name, parameters[name], nominal_value(netlist, name), samples, rng)
+                   for name in names]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    raise ValueError(f"Unknown sweep mode: {mode}")
+
+
+def _value_index(tokens):
+    """Posición del valor en una línea de elemento (None si no se puede barrer)"""
+    if tokens[0][0].lower() not in _SWEEPABLE or len(tokens) < 4:
+        return None
+    # Fuentes: "V1 a b DC 5" o "V1 a b 5"
+    if tokens[3].lower() == 'dc' and len(tokens) > 4:
+        return 4
+    return 3 if spice_number(tokens[3]) is not None else None
+
+
+def _param_pattern(name):
+    return re.compile(rf'(?i)(?<![\w.])({re.escape(name)}\s*=\s*)([^\s{{}}]+|\{{[^}}]*\}})')
+
+
+def nominal_value(netlist, name):
+    """Valor nominal de un elemento (R1, C1...) o de un .param en el netlist"""
+    pattern = _param_pattern(name)
+    for line in netlist.split('\n'):
+        tokens = line.split()
+        if not tokens:
+            continue
+        if tokens[0].lower() == name.lower():
+            index = _value_index(tokens)
+            return spice_number(tokens[index]) if index is not None else None
+        if tokens[0].lower() == '.param':
+            match = pattern.search(line)
+            if match:
+                return spice_number(match.group(2))
+    return None
+
+
+def apply_parameters(netlist, values):
+    """Sustituye en el netlist el valor de cada elemento o .param de `values`"""
+    elements = {name.lower(): value for name, value in values.items()}
+    found = set()
+    lines = []
+
+    for line in netlist.split('\n'):
+        tokens = line.split()
+        if tokens and tokens[0].lower() in elements:
+            index = _value_index(tokens)
+            if index is None:
+                raise ValueError(f"Cannot sweep the value of {tokens[0]}")
+            tokens[index] = format(elements[tokens[0].lower()], '.12g')
+            found.add(tokens[0].lower())
+            line = ' '.join(tokens)
+        elif tokens and tokens[0].lower() == '.param':
+            for name, value in elements.items():
+                line, count = _param_pattern(name).subn(
+                    lambda m: m.group(1) + format(value, '.12g'), line)
+                if count:
+                    found.add(name)
+        lines.append(line)
+
+    missing = [name for name in values if name.lower() not in found]
+    if missing:
+        raise ValueError(f"Parameters not found in the netlist: {', '.join(missing)}")
+    return '\n'.join(lines)
+
+
+def _main_plot(plots, name=None):
+    """Plot de referencia: el del nombre dado o el primero con más de un punto"""
+    if name is not None:
+        return next((p for p in plots if p["name"] == name), None)
+    return next((p for p in plots if p["points"] > 1), plots[0] if plots else None)
+
+
+def _vector_array(vector):
+    """Array de un vector de plot_to_dict (complejo si tiene real/imag)"""
+    if "values" in vector:
+        return np.asarray(vector["values"])
+    return np.asarray(vector["real"]) + 1j * np.asarray(vector["imag"])
+
+
+def _resample(scale, values, ref_scale):
+    """Interpola un vector sobre la escala de referencia (paso adaptativo en .tran)"""
+    if len(scale) == len(ref_scale) and np.array_equal(scale, ref_scale):
+        return values
+    if np.iscomplexobj(values):
+        return (np.interp(ref_scale, scale, values.real)
+                + 1j * np.interp(ref_scale, scale, values.imag))
+    return np.interp(ref_scale, scale, values)
+
+
+def stack_results(results):
+    """
+    Apila los vectores del plot principal de cada punto en arrays (puntos x escala)
+    con media, desviación, mínimo y máximo por punto de la escala. Los vectores
+    complejos se apilan como real/imag y las estadísticas usan su magnitud.
+    `results` es una lista de resultados de simulación (None si el punto falló).
+    """
+    valid = [(i, r) for i, r in enumerate(results) if r and r["ok"] and r["plots"]]
+    if not valid:
+        return {"plot": None, "points": [], "scale": None, "vectors": {}}
+
+    ref = _main_plot(valid[0][1]["plots"])
+    scale_name = ref["scale"]
+    ref_scale = np.real(_vector_array(ref["vectors"][scale_name]))
+
+    indices = []
+    columns = {name: [] for name in ref["vectors"] if name != scale_name}
+    for i, result in valid:
+        plot = _main_plot(result["plots"], ref["name"])
+        if plot is None or plot["points"] < 1:
+            continue
+        scale = np.real(_vector_array(plot["vectors"][plot["scale"]]))
+        indices.append(i)
+        for name, column in columns.items():
+            values = _vector_array(plot["vectors"][name]) if name in plot["vectors"] else \
+                np.full(len(scale), np.nan)
+            column.append(_resample(scale, values, ref_scale) if len(scale) > 1 else values)
+
+    vectors = {}
+    for name, column in columns.items():
+        stacked = np.vstack(column)
+        stats_input = np.abs(stacked) if np.iscomplexobj(stacked) else stacked
+        entry = {"type": ref["vectors"][name]["type"]}
+        if np.iscomplexobj(stacked):
+            entry["real"] = stacked.real
+            entry["imag"] = stacked.imag
+        else:
+            entry["values"] = stacked
+        entry["mean"] = np.nanmean(stats_input, axis=0)
+        entry["std"] = np.nanstd(stats_input, axis=0)
+        entry["min"] = np.nanmin(stats_input, axis=0)
+        entry["max"] = np.nanmax(stats_input, axis=0)
+        vectors[name] = entry
+
+    return {
+        "plot": ref["name"],
+        "points": indices,
+        "scale": {"name": scale_name, "values": ref_scale},
+        "vectors": vectors,
+    }
@@ -0,0 +1,72 @@
+"""
+Servidor local que imita el endpoint de chat de OpenRouter para los benchmarks.
+
+Responde en streaming (SSE, como OpenRouter) con `deltas` fragmentos de
+`delta_size` caracteres, comentarios keep-alive intercalados y [DONE] al final;
+sin streaming devuelve la respuesta completa. Corre en un hilo con uvicorn.
+"""
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import Body, FastAPI
+from fastapi.responses import StreamingResponse
+
+# Texto de la respuesta: incluye un bloque de código (no SPICE) para ejercitar el detector
+_TEXT = ("El filtro RC atenúa las frecuencias altas; la frecuencia de corte es 1/(2πRC). "
+         "```python\nprint('fc =', 1 / (2 * 3.1416 * 1e3 * 1e-6))\n```\n")
+
+
+def create_app(deltas=10000, delta_size=8):
+    app = FastAPI()
+    text = (_TEXT * (deltas * delta_size // len(_TEXT) + 1))[:deltas * delta_size]
+
+    @app.post("/v1/chat/completions")
+    async def completions(body: dict = Body(...)):
+        if not body.get("stream"):
+            return {"choices": [{"message": {"role": "assistant", "content": text}}]}
+
+        async def events():
+            for i in range(deltas):
+                delta = {"choices": [{"index": 0, "delta": {"content": text[i * delta_size:(i + 1) * delta_size]}}]}
+                yield f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode('utf-8')
+                if i % 1000 == 0:
+                    yield b": OPENROUTER PROCESSING\n\n"
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeOpenRouter:
+    """Arranca el servidor falso en un puerto libre; url apunta a /v1/chat/completions"""
+
+    def __init__(self, deltas=10000, delta_size=8):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}/v1/chat/completions"
+        config = uvicorn.Config(create_app(deltas, delta_size), host="127.0.0.1", port=self.port,
+                                log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake OpenRouter server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
@@ -0,0 +1,100 @@
+"""
+Rawfiles sintéticos para los benchmarks.
+
+Genera rawfiles con el mismo formato que ngspice (binario o ASCII, real o
+complejo) a partir de señales deterministas. Los tamaños pequeños están
+versionados en bench/data; los grandes (10^5 a 10^7 puntos) se generan al
+vuelo en un directorio de caché porque ocuparían cientos de MB.
+
+    python -m bench.rawfiles   # regenera los archivos de bench/data
+"""
+import os
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# Rawfiles versionados: nombre -> (puntos, análisis, binario)
+FIXTURES = {
+    "tran_1e3.raw": (1000, "tran", True),
+    "tran_1e3_ascii.raw": (1000, "tran", False),
+    "tran_1e4.raw": (10000, "tran", True),
+    "ac_1e3.raw": (1000, "ac", True),
+}
+
+
+def _header(plotname, flags, variables, points, section):
+    lines = [
+        "Title: benchmark circuit",
+        "Date: Thu Jan  1 00:00:00  2026",
+        f"Plotname: {plotname}",
+        f"Flags: {flags}",
+        f"No. Variables: {len(variables)}",
+        f"No. Points: {points}",
+        "Variables:",
+    ]
+    lines += [f"\t{i}\t{name}\t{kind}" for i, (name, kind) in enumerate(variables)]
+    lines.append(f"{section}:")
+    return ('\n'.join(lines) + '\n').encode('ascii')
+
+
+def synthetic_data(points, analysis="tran"):
+    """(plotname, flags, variables, tabla puntos x variables) de una señal determinista"""
+    if analysis == "ac":
+        f = np.logspace(0, 6, points)
+        h = 1 / (1 + 1j * f / 1e3)
+        table = np.stack([f + 0j, np.ones(points, dtype=complex), h], axis=1)
+        return ("AC Analysis", "complex",
+                [("frequency", "frequency"), ("v(in)", "voltage"), ("v(out)", "voltage")], table)
+
+    t = np.linspace(0, 1e-3, points)
+    vin = np.sin(2 * np.pi * 5e3 * t)
+    vout = vin * np.exp(-t / 2e-4)
+    table = np.stack([t, vin, vout, vout / 1e3], axis=1)
+    return ("Transient Analysis", "real",
+            [("time", "time"), ("v(in)", "voltage"), ("v(out)", "voltage"), ("i(r1)", "current")],
+            table)
+
+
+def write_rawfile(path, points, analysis="tran", binary=True):
+    """Escribe un rawfile sintético de `points` puntos"""
+    plotname, flags, variables, table = synthetic_data(points, analysis)
+    with open(path, 'wb') as f:
+        f.write(_header(plotname, flags, variables, points, "Binary" if binary else "Values"))
+        if binary:
+            f.write(np.ascontiguousarray(table).tobytes())
+            return
+
+        # ASCII: " <índice>\t<valor>" y luego "\t<valor>" por variable, línea vacía entre puntos
+        if flags == "complex":
+            cells = np.char.add(np.char.add(np.char.mod('%.15e', table.real), ','),
+                                np.char.mod('%.15e', table.imag))
+        else:
+            cells = np.char.mod('%.15e', table)
+        prefix = np.char.add(np.char.add(' ', np.arange(points).astype(str)), '\t')
+        first = np.char.add(prefix, cells[:, 0])
+        rest = ['\n'.join('\t' + cell for cell in row) for row in cells[:, 1:]]
+        for head, tail in zip(first, rest):
+            f.write(f"{head}\n{tail}\n\n".encode('ascii'))
+
+
+def rawfile_path(points, analysis="tran", binary=True, cache_dir=None):
+    """Ruta de un rawfile del tamaño pedido: el versionado si existe o uno generado en caché"""
+    name = f"{analysis}_1e{int(round(np.log10(points)))}{'' if binary else '_ascii'}.raw"
+    if name in FIXTURES and FIXTURES[name][0] == points:
+        return os.path.join(DATA_DIR, name)
+
+    cache_dir = cache_dir or os.path.join(DATA_DIR, ".cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{analysis}_{points}{'' if binary else '_ascii'}.raw")
+    if not os.path.exists(path):
+        write_rawfile(path + '.tmp', points, analysis, binary)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+if __name__ == "__main__":
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for name, (points, analysis, binary) in FIXTURES.items():
+        write_rawfile(os.path.join(DATA_DIR, name), points, analysis, binary)
+        print(f"{name}: {points} points")
@@ -0,0 +1,286 @@
+"""
+Benchmarks del pipeline de simulación y del relay de /chat.
+
+    python -m bench.run                       # tamaños por defecto (un par de minutos)
+    python -m bench.run --full                # incluye 10^7 puntos y 10^5 archivos
+    python -m bench.run --only rawfile,files --output bench_output.json
+
+Corre sin red: si ngspice no está instalado usa bench/bin/ngspice, y /chat se
+mide contra un OpenRouter falso local (bench/fake_openrouter.py). El resultado
+es un JSON con metadatos del entorno y una entrada por caso:
+
+    {"name", "params", "runs", "min_s", "median_s", "mean_s", ...métricas}
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "bench")
+GROUPS = ("rewrite", "rawfile", "files", "chat", "simulate")
+
+
+def measure(fn, repeat=5, number=1):
+    """Tiempos por llamada de fn(): mínimo, mediana y media de `repeat` rondas de `number` llamadas"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {"runs": repeat * number, "min_s": min(times), "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times)}
+
+
+def result(name, params, timing, **metrics):
+    entry = {"name": name, "params": params, **timing, **metrics}
+    print(f"  {name} {params}: {timing['median_s'] * 1e3:.3f} ms", file=sys.stderr)
+    return entry
+
+
+def small_netlist(index=0):
+    return (f"* RC low-pass {index}\n"
+            f"V1 in 0 AC 1 SIN(0 1 1k)\n"
+            f"R1 in out {1 + index % 1000}k\n"
+            f"C1 out 0 1u\n"
+            f".control\n"
+            f"ac dec 10 1 1meg\n"
+            f"plot vdb(out)\n"
+            f".endc\n"
+            f".end\n")
+
+
+def huge_netlist(lines):
+    body = []
+    for i in range(lines):
+        body.append(f"R{i} n{i} n{i + 1} {1 + i % 97}k")
+        if i % 10 == 0:
+            body.append("+ tc1=0.001")
+    return "* ladder\nV1 n0 0 DC 1\n" + '\n'.join(body) + "\n.control\ntran 1n 1u\n.endc\n.end\n"
+
+
+def bench_rewrite(args):
+    from backend.netlist import canonical_netlist, parse_netlist, rewrite_netlist
+
+    results = []
+    net = small_netlist()
+    results.append(result("rewrite.small", {"lines": net.count('\n')},
+                          measure(lambda: rewrite_netlist(net, "output.raw"), args.repeat, 1000)))
+
+    sizes = [10 ** 4, 10 ** 5] + ([10 ** 6] if args.full else [])
+    for lines in sizes:
+        net = huge_netlist(lines)
+        timing = measure(lambda: rewrite_netlist(net, "output.raw"), args.repeat)
+        results.append(result("rewrite.huge", {"lines": lines}, timing,
+                              lines_per_s=lines / timing["median_s"]))
+        statements = parse_netlist(net)
+        results.append(result("netlist.canonical", {"lines": lines},
+                              measure(lambda: canonical_netlist(statements), args.repeat)))
+    return results
+
+
+def bench_rawfile(args):
+    from backend.rawfile import read_rawfile
+    from bench.rawfiles import rawfile_path
+
+    results = []
+    top = 7 if args.full else 6
+    for exponent in range(3, top + 1):
+        points = 10 ** exponent
+        for binary in (True, False):
+            # ASCII de 10^7 puntos ocuparía ~1 GB: se mide hasta 10^6
+            if not binary and exponent > 6:
+                continue
+            path = rawfile_path(points, "tran", binary, args.data_dir)
+            timing = measure(lambda: read_rawfile(path), args.repeat if exponent < 6 else 3)
+            results.append(result("rawfile.read", {"points": points, "format": "binary" if binary else "ascii"},
+                                  timing, points_per_s=points / timing["median_s"],
+                                  mb_per_s=os.path.getsize(path) / timing["median_s"] / 1e6))
+        if exponent <= 5:
+            path = rawfile_path(points, "ac", True, args.data_dir)
+            timing = measure(lambda: read_rawfile(path, ["v(out)"]), args.repeat)
+            results.append(result("rawfile.read", {"points": points, "format": "binary-complex",
+                                                   "vectors": ["v(out)"]},
+                                  timing, points_per_s=points / timing["median_s"]))
+    return results
+
+
+def bench_files(args):
+    from backend.library import CircuitIndex
+
+    results = []
+    sizes = [10 ** 4] + ([10 ** 5] if args.full else [])
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as td:
+            directory = os.path.join(td, "circuits")
+            os.makedirs(directory)
+            for i in range(count):
+                with open(os.path.join(directory, f"generated_{i:06d}.cir"), 'w') as f:
+                    f.write(small_netlist(i) if i % 3 else small_netlist(i).replace("C1", "Q1 out in 0 npn\nC1"))
+
+            def legacy_listing():
+                # Lo que hacía /files antes del índice: listdir + getmtime + sort
+                files = [{"name": name, "modified": os.path.getmtime(os.path.join(directory, name))}
+                         for name in os.listdir(directory) if name.endswith('.cir')]
+                files.sort(key=lambda x: x["modified"], reverse=True)
+                return files
+
+            results.append(result("files.legacy_listdir", {"files": count},
+                                  measure(legacy_listing, args.repeat)))
+
+            index = CircuitIndex(directory, os.path.join(td, "index.sqlite3"))
+            # Construcción inicial: una sola vez (las siguientes no tienen nada que indexar)
+            results.append(result("files.index_build", {"files": count}, measure(index.sync, 1)))
+
+            def first_page():
+                index.refresh()
+                return index.list(100)
+
+            page = index.list(100, offset=count // 2)
+            cursor = page["next_cursor"]
+            results.append(result("files.list_first_page", {"files": count, "limit": 100},
+                                  measure(first_page, args.repeat, 20)))
+            results.append(result("files.list_cursor", {"files": count, "limit": 100, "position": count // 2},
+                                  measure(lambda: index.list(100, cursor), args.repeat, 20)))
+            results.append(result("files.search", {"files": count, "q": "00042"},
+                                  measure(lambda: index.list(100, query="00042"), args.repeat, 5)))
+            results.append(result("files.filter_element", {"files": count, "element": "q"},
+                                  measure(lambda: index.list(100, element="q"), args.repeat, 20)))
+    return results
+
+
+def bench_chat(args):
+    from fastapi.testclient import TestClient
+
+    import backend.app as app_module
+    from bench.fake_openrouter import FakeOpenRouter
+
+    results = []
+    deltas = 50000 if args.full else 10000
+    with FakeOpenRouter(deltas=deltas, delta_size=8) as fake:
+        app_module.OPENROUTER_URL = fake.url
+        with TestClient(app_module.app) as client:
+            for passthrough in (False, True):
+                received = {}
+
+                def relay():
+                    with client.stream("POST", "/chat", json={"user": "RC", "stream": True,
+                                                              "passthrough": passthrough}) as r:
+                        received["bytes"] = sum(len(chunk) for chunk in r.iter_bytes())
+
+                timing = measure(relay, max(args.repeat // 2, 2))
+                results.append(result("chat.sse_relay", {"deltas": deltas, "passthrough": passthrough},
+                                      timing, deltas_per_s=deltas / timing["median_s"],
+                                      bytes=received["bytes"]))
+
+            timing = measure(lambda: client.post("/chat", json={"user": "RC"}).json(), args.repeat)
+            results.append(result("chat.non_stream", {"chars": deltas * 8}, timing))
+    return results
+
+
+def bench_simulate(args):
+    from fastapi.testclient import TestClient
+
+    import backend.app as app_module
+
+    results = []
+    counter = iter(range(10 ** 9))
+    with TestClient(app_module.app) as client:
+        def simulate():
+            # Netlist distinto en cada llamada: se mide la simulación, no la caché
+            r = client.post("/simulate", json={"netlist": small_netlist(next(counter))})
+            assert r.status_code == 200
+
+        results.append(result("simulate.single", {"engine": app_module.SIM_ENGINE},
+                              measure(simulate, args.repeat)))
+
+        net = small_netlist(10 ** 6)
+        client.post("/simulate", json={"netlist": net})
+        results.append(result("simulate.cached", {},
+                              measure(lambda: client.post("/simulate", json={"netlist": net}), args.repeat, 10)))
+
+        count = 200 if args.full else 50
+
+        def batch():
+            netlists = [small_netlist(next(counter)) for _ in range(count)]
+            r = client.post("/simulate/batch", json={"netlists": netlists, "plots": False, "stream": False})
+            assert r.json()["summary"]["ok"] == count
+
+        timing = measure(batch, 3)
+        results.append(result("simulate.batch", {"netlists": count,
+                                                 "workers": app_module.simulation_scheduler.workers},
+                              timing, netlists_per_s=count / timing["median_s"]))
+    return results
+
+
+def environment(stub):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    import numpy as np
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ngspice": "stub" if stub else shutil.which("ngspice"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument("--only", help=f"grupos separados por coma ({','.join(GROUPS)})")
+    parser.add_argument("--full", action="store_true", help="incluir los tamaños más grandes")
+    parser.add_argument("--repeat", type=int, default=5, help="rondas por caso")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--data-dir", help="caché de los rawfiles generados (por defecto bench/data/.cache)")
+    args = parser.parse_args(argv)
+
+    groups = args.only.split(',') if args.only else list(GROUPS)
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    # Sin ngspice instalado: usar el de reemplazo
+    stub = shutil.which("ngspice") is None
+    if stub:
+        os.environ["PATH"] = os.path.join(BENCH_DIR, "bin") + os.pathsep + os.environ["PATH"]
+
+    # Estado del backend (índice, almacén, caché en disco) en un directorio temporal
+    workdir = tempfile.mkdtemp(prefix="spice-bench-")
+    os.environ.setdefault("FILES_INDEX_PATH", os.path.join(workdir, "index.sqlite3"))
+    os.environ.setdefault("CIRCUITS_STORE_DIR", os.path.join(workdir, "objects"))
+    os.environ.pop("SIM_CACHE_DIR", None)
+    sys.path.insert(0, ROOT)
+
+    benchmarks = {"rewrite": bench_rewrite, "rawfile": bench_rawfile, "files": bench_files,
+                  "chat": bench_chat, "simulate": bench_simulate}
+    results = []
+    try:
+        for group in groups:
+            print(f"[{group}]", file=sys.stderr)
+            results += benchmarks[group](args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = json.dumps({"meta": environment(stub), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -448,14 +448,20 @@ function updateConfigUI() {
 
 // ==== FILE MANAGEMENT ======================================================
 
-async function loadFileList() {
+// Una página de /files (más reciente primero); next_cursor pide la siguiente.
+// q filtra por nombre o título y element por tipo de elemento (p. ej. "q")
+async function loadFileList({ limit = 50, cursor = null, q = '', element = '' } = {}) {
   try {
-    const response = await fetch(`${BACKEND}/files`);
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) params.set('cursor', cursor);
+    if (q) params.set('q', q);
+    if (element) params.set('element', element);
+    const response = await fetch(`${BACKEND}/files?${params}`);
     const data = await response.json();
-    return data.files || [];
+    return { files: data.files || [], next_cursor: data.next_cursor || null };
   } catch (e) {
     console.error('Error loading file list:', e);
-    return [];
+    return { files: [], next_cursor: null };
   }
 }
 
@@ -593,8 +599,9 @@ function updateFileInfo() {
 }
 
 async function refreshFileList() {
-  const files = await loadFileList();
-  console.log('Available files:', files.length);
+  // Solo hacen falta los más recientes, no la biblioteca entera
+  const { files } = await loadFileList({ limit: 3 });
+  console.log('Recent files:', files.length);
   
   // Si no hay archivos abiertos, abrir los 3 más recientes
   if (openFiles.size === 0 && files.length > 0) {
@@ -731,7 +738,7 @@ async function onAsk() {
       await refreshFileList();
       
       // Si se generaron archivos, abrir el más reciente
-      const files = await loadFileList();
+      const { files } = await loadFileList({ limit: 1 });
       if (files.length > 0) {
         const newestFile = files[0]; // Ya están ordenados por fecha de modificación
         if (!openFiles.has(newestFile.name)) {
@@ -747,14 +754,56 @@ async function onAsk() {
 
 // ==== SIMULACIÓN NGSPICE ===================================================
 
+// Formato binario de /simulate (ver backend/encoding.py): los vectores llegan
+// como buffers little-endian y se usan como Float64Array/Float32Array sin parsear
+const VECTORS_MEDIA_TYPE = 'application/x-ngspice-vectors';
+
+// Puntos por traza que se piden al backend (la gráfica no muestra más que esto)
+const MAX_PLOT_POINTS = 4000;
+
+function decodeVectors(buffer) {
+  const headerLength = new DataView(buffer).getUint32(0, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+  const base = 4 + headerLength;
+  const arrays = header.buffers.map(({ offset, length, dtype }) =>
+    dtype === 'float32'
+      ? new Float32Array(buffer, base + offset, length)
+      : new Float64Array(buffer, base + offset, length));
+
+  // Reemplazar {buffer: i} por el array correspondiente
+  const restore = (value) => {
+    if (Array.isArray(value)) return value.map(restore);
+    if (value && typeof value === 'object') {
+      if (typeof value.buffer === 'number' && Object.keys(value).length === 1) return arrays[value.buffer];
+      return Object.fromEntries(Object.entries(value).map(([k, v]) => [k, restore(v)]));
+    }
+    return value;
+  };
+  const { buffers, ...data } = header;
+  return restore(data);
+}
+
 async function simulateNetlist(netlist) {
   const r = await fetch(`${BACKEND}/simulate`, {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ netlist }),
+    headers: { 'Content-Type': 'application/json', 'Accept': `${VECTORS_MEDIA_TYPE}, application/json` },
+    body: JSON.stringify({ netlist, dtype: 'float32', max_points: MAX_PLOT_POINTS }),
   });
   if (!r.ok) throw new Error(`Backend /simulate ${r.status}`);
-  return r.json(); // { ok, logs, x, y }
+  if ((r.headers.get('Content-Type') || '').startsWith(VECTORS_MEDIA_TYPE)) {
+    return decodeVectors(await r.arrayBuffer()); // { ok, logs, x, y, plots }
+  }
+  return r.json(); // { ok, logs, x, y, plots }
+}
+
+// Mínimo y máximo sin expandir el array (evita desbordar la pila con muchos puntos)
+function arrayRange(values) {
+  let min = Infinity, max = -Infinity;
+  for (const v of values) {
+    if (v < min) min = v;
+    if (v > max) max = v;
+  }
+  return [min, max];
 }
 
 async function onRun() {
@@ -787,14 +836,15 @@ async function onRun() {
     if (data.x?.length && data.y?.length) {
       appendToConsole(`📊 Datos generados: ${data.x.length} puntos`, 'success');
       appendToConsole(`Rango X: ${data.x[0]} → ${data.x[data.x.length-1]}`, 'info');
-      appendToConsole(`Rango Y: ${Math.min(...data.y)} → ${Math.max(...data.y)}`, 'info');
+      const [yMin, yMax] = arrayRange(data.y);
+      appendToConsole(`Rango Y: ${yMin} → ${yMax}`, 'info');
       
       // Mostrar gráfico si está habilitado en la configuración
       if (config.showPlots) {
         const title = data.plot_title || `Simulación ${activeFile || 'Sin título'}`;
         const xLabel = data.x_label || 'X';
         const yLabel = data.y_label || 'Y';
-        showChart(data.x, data.y, title, xLabel, yLabel);
+        showChart(Array.from(data.x), Array.from(data.y), title, xLabel, yLabel);
         appendToConsole('📈 Gráfico generado - Ver pestaña "Gráficos" 📊', 'success');
       } else {
         appendToConsole('💡 Tip: Habilita "Mostrar gráficos" en configuración para ver el gráfico', 'info');
@@ -842,24 +892,42 @@ if (saveConfigBtn) {
 const openMoreFilesBtn = document.getElementById('open-more-files');
 if (openMoreFilesBtn) {
   openMoreFilesBtn.addEventListener('click', async () => {
-    const files = await loadFileList();
-    if (files.length === 0) {
+    // Se piden páginas a medida que hacen falta; un texto busca en el servidor
+    let filter = {};
+    let page = await loadFileList();
+    if (page.files.length === 0) {
       alert('No hay archivos disponibles');
       return;
     }
-    
-    // Mostrar archivos que no están abiertos
-    const unopenedFiles = files.filter(f => !openFiles.has(f.name));
-    if (unopenedFiles.length === 0) {
-      alert('Todos los archivos ya están abiertos');
-      return;
-    }
-    
-    const fileNames = unopenedFiles.map(f => f.name);
-    const choice = prompt(`Archivos disponibles:\n${fileNames.join('\n')}\n\nEscribe el nombre del archivo a abrir:`);
-    
-    if (choice && fileNames.includes(choice)) {
-      await openFile(choice);
+
+    while (true) {
+      // Mostrar archivos que no están abiertos
+      const fileNames = page.files.filter(f => !openFiles.has(f.name)).map(f => f.name);
+      const more = page.next_cursor ? '\nDeja vacío para ver más archivos.' : '';
+      const choice = prompt(
+        `Archivos disponibles:\n${fileNames.join('\n') || '(ninguno sin abrir en esta página)'}\n\n` +
+        `Escribe el nombre del archivo a abrir, un texto para buscar por nombre o título, ` +
+        `o "elemento:q" para filtrar por tipo de elemento.${more}`);
+      if (choice === null) return;
+
+      const text = choice.trim();
+      if (fileNames.includes(text)) {
+        await openFile(text);
+        return;
+      }
+      if (!text) {
+        if (!page.next_cursor) return;
+        page = await loadFileList({ ...filter, cursor: page.next_cursor });
+        continue;
+      }
+
+      const element = text.match(/^elemento:\s*(\S+)$/i);
+      filter = element ? { element: element[1] } : { q: text };
+      page = await loadFileList(filter);
+      if (page.files.length === 0) {
+        alert('No se encontraron archivos');
+        return;
+      }
     }
   });
 }